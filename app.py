@@ -1,13 +1,38 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import re
+import os
+import json
+import time
+import hashlib
+import uuid
+import threading
+import sqlite3
+import urllib.request
+import urllib.error
 import altair as alt
+from collections import OrderedDict
+from itertools import repeat
 from io import BytesIO
-from datetime import date
+from contextlib import closing
+from functools import partial, wraps
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from datetime import date, datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.worksheet.worksheet import Worksheet
 import gspread
+from gspread.utils import rowcol_to_a1, ValueRenderOption, DateTimeOption
 from google.oauth2.service_account import Credentials
-import plotly.express as px  # ← TAMBAH INI
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import plotly.graph_objects as go  # ← TAMBAH INI
+from ingest_worker import parse_xlsx, buat_pool
 
 # =============================
 # KONFIGURASI AWAL
@@ -43,9 +68,320 @@ PENGENDALI_MAP = {
 MA_DRIVE_URL = "https://docs.google.com/spreadsheets/d/15StwZUyvQ7jhkVE97sL6tSO5z3UPXk0-/export?format=xlsx"
 SIMRS_DRIVE_URL = "https://docs.google.com/spreadsheets/d/1dS9ukqE-epEapvaAySZEuyyhYkZsBsxF/export?format=xlsx&gid=332941727"
 VPU_DRIVE_URL = "https://docs.google.com/spreadsheets/d/1dS9ukqE-epEapvaAySZEuyyhYkZsBsxF/export?format=xlsx&gid=1400931617"
-VERIFIKASI_DRIVE_URL = "https://docs.google.com/spreadsheets/d/1qhw5rS_dXNpcqzuOOQqdCQSvIhC1mAb1YC0Un_zf8_c/export?format=xlsx"
 VERIFIKASI_FILE_ID = "1qhw5rS_dXNpcqzuOOQqdCQSvIhC1mAb1YC0Un_zf8_c"
 
+# =============================
+# SNAPSHOT DATA LOKAL (PARQUET)
+# =============================
+SNAPSHOT_DIR = Path(os.environ.get("SNAPSHOT_DIR", Path(__file__).parent / ".snapshot"))
+SNAPSHOT_TTL = 300      # detik, snapshot dianggap masih segar tanpa cek ke Drive
+SNAPSHOT_TIMEOUT = 30   # detik, batas waktu unduh dari Google Drive
+
+SUMBER_DRIVE = {
+    "ma": MA_DRIVE_URL,
+    "simrs": SIMRS_DRIVE_URL,
+    "vpu": VPU_DRIVE_URL,
+}
+TIMEOUT_SUMBER = {      # detik per sumber (unduh dan parse masing-masing)
+    "ma": 30,
+    "simrs": 60,
+    "vpu": 30,
+}
+
+def _path_snapshot(nama):
+    """Lokasi file data (Parquet) dan metadata (JSON) snapshot"""
+    return SNAPSHOT_DIR / f"{nama}.parquet", SNAPSHOT_DIR / f"{nama}.json"
+
+def baca_meta_snapshot(nama):
+    """Baca metadata snapshot (hash, ETag, waktu ambil), kosong jika belum ada"""
+    _, meta_path = _path_snapshot(nama)
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _siapkan_parquet(df):
+    """Seragamkan nama & tipe kolom campuran (angka + teks) agar bisa ditulis ke Parquet"""
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    tipe_aman = {"string", "empty", "integer", "floating", "mixed-integer-float",
+                 "boolean", "datetime", "datetime64", "date", "decimal"}
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in tipe_aman:
+            df[col] = df[col].map(str, na_action="ignore")
+    return df
+
+def simpan_snapshot(nama, df, meta):
+    """Tulis snapshot secara atomik (file sementara lalu rename)"""
+    data_path, meta_path = _path_snapshot(nama)
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_data = data_path.with_suffix(f".{os.getpid()}.tmp")
+    _siapkan_parquet(df).to_parquet(tmp_data, index=False)
+    os.replace(tmp_data, data_path)
+    simpan_meta_snapshot(nama, meta)
+
+def simpan_meta_snapshot(nama, meta):
+    """Tulis hanya sidecar JSON meta secara atomik (isi snapshot tidak berubah)"""
+    _, meta_path = _path_snapshot(nama)
+    tmp_meta = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_meta.write_text(json.dumps(meta))
+    os.replace(tmp_meta, meta_path)
+
+def unduh_sumber(url, meta, timeout=SNAPSHOT_TIMEOUT):
+    """
+    Unduh file dari Google Drive dengan conditional request (ETag/Last-Modified).
+    Return (konten, header); konten None jika server menjawab 304 Not Modified.
+    """
+    req = urllib.request.Request(url)
+    if meta.get("etag"):
+        req.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        req.add_header("If-Modified-Since", meta["last_modified"])
+
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.read(), resp.headers
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, e.headers
+        raise
+
+def _baca_snapshot_lama(nama, meta, error):
+    """Fallback: pakai snapshot terakhir yang valid saat sumber gagal/timeout"""
+    data_path, _ = _path_snapshot(nama)
+    return pd.read_parquet(data_path), {**meta, "stale": True, "error": error}
+
+def muat_snapshot(nama, url, paksa=False, timeout=SNAPSHOT_TIMEOUT, parser=parse_xlsx, termuat=None):
+    """
+    Muat data sumber dari snapshot lokal dengan refresh bersyarat dari Google Drive.
+    - Snapshot < SNAPSHOT_TTL detik langsung dibaca dari disk (tanpa jaringan)
+    - File hanya di-parse ulang jika isinya berubah (304 / hash SHA-256 sama = pakai snapshot)
+    - Isi tidak berubah: hanya meta JSON yang ditulis ulang; frame yang sudah di memori
+      (termuat = (df, sha256)) dipakai lagi tanpa membaca Parquet
+    - Jika Drive lambat/gagal, snapshot terakhir yang valid tetap dipakai (meta["stale"])
+    """
+    mulai = time.perf_counter()
+    data_path, _ = _path_snapshot(nama)
+    meta = baca_meta_snapshot(nama)
+    ada_snapshot = bool(meta) and data_path.exists()
+
+    def frame_snapshot():
+        if termuat is not None and termuat[1] == meta.get("sha256"):
+            return termuat[0]
+        return pd.read_parquet(data_path)
+
+    if ada_snapshot and not paksa and time.time() - meta.get("fetched_at", 0) < SNAPSHOT_TTL:
+        return frame_snapshot(), {**meta, "durasi": time.perf_counter() - mulai}
+
+    try:
+        konten, header = unduh_sumber(url, meta if ada_snapshot else {}, timeout=timeout)
+        meta_baru = {
+            "url": url,
+            "etag": header.get("ETag") or meta.get("etag"),
+            "last_modified": header.get("Last-Modified") or meta.get("last_modified"),
+            "fetched_at": time.time(),
+        }
+
+        if konten is None or (ada_snapshot and hashlib.sha256(konten).hexdigest() == meta.get("sha256")):
+            # Isi file tidak berubah: cukup perbarui waktu ambil di meta, Parquet tidak disentuh
+            meta_baru["sha256"] = meta.get("sha256")
+            meta_baru["rows"] = meta.get("rows")
+            df = frame_snapshot()
+            simpan = partial(simpan_meta_snapshot, nama, meta_baru)
+        else:
+            df = parser(konten)
+            meta_baru["sha256"] = hashlib.sha256(konten).hexdigest()
+            meta_baru["rows"] = len(df)
+            simpan = partial(simpan_snapshot, nama, df, meta_baru)
+    except Exception as e:
+        if not ada_snapshot:
+            raise
+        df, meta_baru = _baca_snapshot_lama(nama, meta, str(e) or type(e).__name__)
+        return df, {**meta_baru, "durasi": time.perf_counter() - mulai}
+
+    try:
+        simpan()
+    except Exception as e:
+        meta_baru["error_simpan"] = str(e)
+    return df, {**meta_baru, "durasi": time.perf_counter() - mulai}
+
+def info_snapshot(meta):
+    """Teks singkat waktu pengambilan snapshot"""
+    if not meta.get("fetched_at"):
+        return "-"
+    return datetime.fromtimestamp(meta["fetched_at"]).strftime("%d/%m/%Y %H:%M")
+
+# =============================
+# INGEST PARALEL (UNDUH + PARSE)
+# =============================
+@st.cache_resource
+def pool_parser():
+    """
+    Process pool untuk parse XLSX (openpyxl CPU-bound dan menahan GIL).
+    Memakai forkserver/spawn, bukan fork (lihat ingest_worker.buat_pool).
+    """
+    return buat_pool(len(SUMBER_DRIVE))
+
+def _parse_xlsx_di_pool(pool, timeout, konten):
+    """Parse XLSX di process pool; fallback parse di thread jika pool tidak tersedia"""
+    try:
+        future = pool.submit(parse_xlsx, konten)
+    except RuntimeError:
+        # Pool rusak atau sudah dimatikan oleh sumber lain yang timeout
+        pool_parser.clear()
+        return parse_xlsx(konten)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # Sebelum Python 3.11 bukan subclass TimeoutError bawaan.
+        # Worker macet tidak boleh dipakai ulang: matikan pool, panggilan berikut buat baru
+        pool_parser.clear()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    except (BrokenProcessPool, CancelledError):
+        pool_parser.clear()
+        return parse_xlsx(konten)
+
+def muat_semua_snapshot(paksa=False, termuat=None):
+    """
+    Ambil semua sumber Drive sekaligus: unduh paralel di thread, parse di process pool.
+    Setiap sumber punya batas waktu sendiri (TIMEOUT_SUMBER); sumber yang gagal tidak
+    menahan sumber lain dan memakai snapshot lama bila ada.
+    termuat = {nama: (df, sha256)} frame yang sudah di memori untuk dipakai ulang.
+    Return (hasil, gagal, durasi) dengan hasil = {nama: (df, meta)}, gagal = {nama: error}.
+    """
+    pool = pool_parser()
+    mulai = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(SUMBER_DRIVE), thread_name_prefix="ingest")
+    futures = {
+        nama: executor.submit(
+            muat_snapshot, nama, url, paksa, TIMEOUT_SUMBER[nama],
+            partial(_parse_xlsx_di_pool, pool, TIMEOUT_SUMBER[nama]),
+            (termuat or {}).get(nama)
+        )
+        for nama, url in SUMBER_DRIVE.items()
+    }
+
+    hasil, gagal = {}, {}
+    for nama, future in futures.items():
+        # Batas keras per sumber: unduh + parse
+        sisa = max(0.0, 2 * TIMEOUT_SUMBER[nama] - (time.perf_counter() - mulai))
+        try:
+            hasil[nama] = future.result(timeout=sisa)
+        except Exception as e:
+            pesan = str(e) or f"timeout {2 * TIMEOUT_SUMBER[nama]} detik"
+            gagal[nama] = pesan
+            meta = baca_meta_snapshot(nama)
+            if meta and _path_snapshot(nama)[0].exists():
+                hasil[nama] = _baca_snapshot_lama(nama, meta, pesan)
+
+    executor.shutdown(wait=False)
+    return hasil, gagal, time.perf_counter() - mulai
+
+# =============================
+# REGISTRI CACHE (INVALIDASI PER SUMBER DATA)
+# =============================
+class RegistriCache:
+    """
+    Daftar cache bernama beserta sumber data yang menjadi dependensinya.
+    Tulis ke satu sumber hanya membersihkan cache yang bergantung padanya;
+    counter panggil / miss / buang (dan hit rate) per cache ditampilkan di sidebar admin.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entri = {}
+
+    def daftar(self, nama, bergantung, bersihkan):
+        with self._lock:
+            entri = self.entri.setdefault(nama, {"panggil": 0, "miss": 0, "buang": 0})
+            # Script dieksekusi ulang tiap rerun: perbarui fungsi pembersih, counter tetap
+            entri["bergantung"] = frozenset(bergantung)
+            entri["bersihkan"] = bersihkan
+
+    def catat(self, nama, jenis, jumlah=1):
+        with self._lock:
+            if nama in self.entri:
+                self.entri[nama][jenis] += jumlah
+
+    def invalidasi(self, *sumber):
+        """Bersihkan cache yang bergantung pada salah satu sumber; return nama cache yang dibersihkan"""
+        with self._lock:
+            kena = [nama for nama, e in self.entri.items() if e["bergantung"] & set(sumber)]
+            for nama in kena:
+                self.entri[nama]["bersihkan"]()
+                self.entri[nama]["buang"] += 1
+        return kena
+
+    def statistik(self):
+        with self._lock:
+            return pd.DataFrame([
+                {
+                    "cache": nama,
+                    "sumber": ", ".join(sorted(e["bergantung"])) or "-",
+                    "hit": e["panggil"] - e["miss"],
+                    "miss": e["miss"],
+                    "hit_rate": round((e["panggil"] - e["miss"]) / e["panggil"] * 100, 1) if e["panggil"] else 0.0,
+                    "buang": e["buang"],
+                }
+                for nama, e in sorted(self.entri.items())
+            ])
+
+@st.cache_resource
+def registri_cache():
+    return RegistriCache()
+
+def cache_bernama(nama, bergantung=(), **opsi):
+    """
+    st.cache_resource yang terdaftar di registri_cache dengan nama dan dependensi sumber.
+    Badan fungsi hanya berjalan saat miss, jadi miss dihitung di dalamnya.
+    """
+    def pasang(fungsi):
+        @wraps(fungsi)
+        def hitung_miss(*args, **kwargs):
+            registri_cache().catat(nama, "miss")
+            return fungsi(*args, **kwargs)
+
+        tercache = st.cache_resource(**opsi)(hitung_miss)
+
+        @wraps(fungsi)
+        def panggil(*args, **kwargs):
+            registri_cache().catat(nama, "panggil")
+            return tercache(*args, **kwargs)
+
+        panggil.clear = tercache.clear
+        registri_cache().daftar(nama, bergantung, tercache.clear)
+        return panggil
+    return pasang
+
+# =============================
+# CACHE SPESIFIKASI GRAFIK
+# =============================
+def sidik_grafik(*bagian):
+    """Sidik agregat input grafik (isi DataFrame) beserta opsi tampilannya"""
+    h = hashlib.sha256()
+    for b in bagian:
+        if isinstance(b, pd.DataFrame):
+            h.update(repr((list(b.columns), list(b.dtypes.astype(str)))).encode())
+            h.update(pd.util.hash_pandas_object(b, index=True).to_numpy().tobytes())
+        else:
+            h.update(repr(b).encode())
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+@cache_bernama("spesifikasi_grafik", ["ma", "simrs", "vpu"], max_entries=64, show_spinner=False)
+def spesifikasi_grafik(jenis, sidik, _bangun):
+    """
+    Spesifikasi grafik terserialisasi: dict Vega-Lite untuk Altair, dict figure untuk Plotly.
+    _bangun hanya dipanggil saat miss; rerun dengan agregat dan opsi yang sama
+    melewati konstruksi chart sepenuhnya. Hasil dipakai bersama: jangan diubah.
+    """
+    return _bangun().to_dict()
+
+def tampil_altair(jenis, bagian, bangun, **opsi):
+    """st.altair_chart lewat cache spesifikasi; bagian = agregat + opsi penentu isi chart"""
+    st.vega_lite_chart(spesifikasi_grafik(jenis, sidik_grafik(*bagian), bangun), **opsi)
+
 # =============================
 # FUNGSI GOOGLE DRIVE
 # =============================
@@ -68,161 +404,1479 @@ def connect_gdrive():
         st.error(f"❌ Gagal koneksi Google Drive: {e}")
         return None
 
-def simpan_dokumen_bermasalah(df):
+KOLOM_VERIFIKASI = ['tanggal_verifikasi', 'perusahaan', 'keterangan',
+                    'no_dokumen', 'nilai', 'masalah', 'status', 'tanggal_input',
+                    'id_dokumen']
+
+# Sel teks yang dianggap kosong: na_values bawaan pandas (dulu diterapkan read_excel) plus
+# "NaT". Baris lama di sheet masih berisi str(NaN) / str(None) dari penulisan versi lama.
+NILAI_KOSONG_SHEET = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "NaT", "None", "n/a", "nan", "null",
+})
+
+def buat_id_dokumen():
+    """ID unik permanen untuk satu dokumen bermasalah"""
+    return uuid.uuid4().hex[:12]
+
+def _nilai_sheet(kolom, nilai):
+    """Nilai sel bertipe untuk Google Sheet: nilai tetap angka, lainnya teks"""
+    if nilai is None or (isinstance(nilai, float) and np.isnan(nilai)):
+        return ""
+    if kolom == "nilai":
+        return float(nilai)
+    return str(nilai)
+
+def _sheet_verifikasi():
+    """
+    Buka sheet verifikasi; return (sheet, header).
+    Sheet lama tanpa kolom id_dokumen diberi header kolom tersebut di ujung kanan.
     """
-    Menyimpan DataFrame dokumen bermasalah ke Google Sheet
+    client = connect_gdrive()
+    if client is None:
+        raise Exception("Koneksi Google Drive gagal")
+
+    sheet = client.open_by_key(VERIFIKASI_FILE_ID).sheet1
+    header = sheet.row_values(1)
+    if header and "id_dokumen" not in header:
+        header.append("id_dokumen")
+        sheet.update_cell(1, len(header), "id_dokumen")
+    return sheet, header
+
+def _indeks_baris(sheet, header):
+    """Indeks id_dokumen -> nomor baris sheet (hanya membaca kolom ID)"""
+    ids = sheet.col_values(header.index("id_dokumen") + 1)
+    return {id_dok: nomor for nomor, id_dok in enumerate(ids[1:], start=2) if id_dok}
+
+def lengkapi_id_dokumen():
+    """
+    Beri id_dokumen pada baris yang belum punya (migrasi sekali untuk data lama).
+    Return jumlah baris yang diberi ID baru.
     """
     try:
-        client = connect_gdrive()
-        if client is None:
-            raise Exception("Koneksi Google Drive gagal")
-        
-        # Kolom yang diperlukan
-        required_columns = ['tanggal_verifikasi', 'perusahaan', 'keterangan', 
-                           'no_dokumen', 'nilai', 'masalah', 'status', 'tanggal_input']
-        
-        # Filter kolom yang ada
-        available_columns = [col for col in required_columns if col in df.columns]
-        df_save = df[available_columns].copy()
-        
-        # Convert datetime columns to string format
-        if 'tanggal_verifikasi' in df_save.columns:
-            df_save['tanggal_verifikasi'] = pd.to_datetime(
-                df_save['tanggal_verifikasi'], 
-                errors='coerce'
-            ).dt.strftime('%Y-%m-%d')
-        
-        if 'tanggal_input' in df_save.columns:
-            df_save['tanggal_input'] = pd.to_datetime(
-                df_save['tanggal_input'], 
-                errors='coerce'
-            ).dt.strftime('%Y-%m-%d')
-        
-        # Simpan ke Google Sheet
-        sheet = client.open_by_key(VERIFIKASI_FILE_ID).sheet1
-        sheet.clear()
-        sheet.update(
-            [df_save.columns.tolist()] + df_save.astype(str).values.tolist()
-        )
+        sheet, header = _sheet_verifikasi()
+        if not header:
+            return 0
+        kolom_id = header.index("id_dokumen") + 1
+        isi_baru = [
+            {"range": rowcol_to_a1(nomor, kolom_id), "values": [[buat_id_dokumen()]]}
+            for nomor, baris in enumerate(sheet.get_all_values()[1:], start=2)
+            if any(baris) and (len(baris) < kolom_id or baris[kolom_id - 1] in NILAI_KOSONG_SHEET)
+        ]
+        if isi_baru:
+            sheet.batch_update(isi_baru, value_input_option="RAW")
+        return len(isi_baru)
+
+    except Exception as e:
+        st.error(f"❌ Gagal melengkapi ID dokumen di Google Drive: {e}")
+        return 0
+
+class DokumenTidakDitemukan(Exception):
+    """id_dokumen tidak ada di Google Sheet (sudah dihapus / diubah dari luar aplikasi)"""
+
+def sheet_tambah_dokumen(baris):
+    """
+    Tambahkan satu dokumen bermasalah ke akhir Google Sheet (append, tanpa menulis ulang sheet).
+    Urutan nilai mengikuti header sheet; sheet kosong diberi header KOLOM_VERIFIKASI dulu.
+    """
+    sheet, header = _sheet_verifikasi()
+    baris_baru = []
+    if not header:
+        header = KOLOM_VERIFIKASI
+        baris_baru.append(header)
+    baris_baru.append([_nilai_sheet(kolom, baris.get(kolom)) for kolom in header])
+
+    sheet.append_rows(
+        baris_baru,
+        value_input_option="RAW",
+        insert_data_option="INSERT_ROWS",
+        table_range="A1"
+    )
+
+def sheet_ubah_dokumen(id_dokumen, perubahan):
+    """
+    Ubah kolom tertentu dari satu dokumen (dicari lewat id_dokumen) dalam satu batch_update.
+    perubahan: {kolom: nilai_baru}; kolom yang tidak ada di header diabaikan.
+    """
+    sheet, header = _sheet_verifikasi()
+    nomor = _indeks_baris(sheet, header).get(id_dokumen)
+    if nomor is None:
+        raise DokumenTidakDitemukan(f"Dokumen dengan ID {id_dokumen} tidak ditemukan")
+
+    sheet.batch_update(
+        [
+            {
+                "range": rowcol_to_a1(nomor, header.index(kolom) + 1),
+                "values": [[_nilai_sheet(kolom, nilai)]],
+            }
+            for kolom, nilai in perubahan.items() if kolom in header
+        ],
+        value_input_option="RAW"
+    )
+
+def sheet_hapus_dokumen(id_dokumen):
+    """Hapus satu baris dokumen (dicari lewat id_dokumen) dari Google Sheet"""
+    sheet, header = _sheet_verifikasi()
+    nomor = _indeks_baris(sheet, header).get(id_dokumen)
+    if nomor is None:
+        raise DokumenTidakDitemukan(f"Dokumen dengan ID {id_dokumen} tidak ditemukan")
+    sheet.delete_rows(nomor)
+
+def baca_sheet_verifikasi():
+    """
+    Baca seluruh sheet verifikasi lewat Sheets values API (satu panggilan get_all_values).
+    Angka diambil mentah (UNFORMATTED_VALUE): teks tampilan seperti "Rp1.500.000" atau
+    "1.500.000,50" tidak terbaca pd.to_numeric. Tanggal tetap teks tampilan, bukan serial.
+    Teks di NILAI_KOSONG_SHEET ("nan", "None", "N/A", ...) menjadi NaN, seperti read_excel dulu.
+    """
+    sheet, _ = _sheet_verifikasi()
+    nilai = sheet.get_all_values(
+        value_render_option=ValueRenderOption.unformatted,
+        date_time_render_option=DateTimeOption.formatted_string,
+    )
+    if len(nilai) < 2:
+        return pd.DataFrame(columns=KOLOM_VERIFIKASI)
+    header = nilai[0]
+    df = pd.DataFrame([baris + [""] * (len(header) - len(baris)) for baris in nilai[1:]], columns=header)
+    df = df[(df != "").any(axis=1)].reset_index(drop=True)
+    return df.replace(sorted(NILAI_KOSONG_SHEET), np.nan)
+
+# =============================
+# STORE LOKAL DOKUMEN BERMASALAH (SQLITE + SINKRON KE SHEET)
+# =============================
+# SQLite (WAL) adalah sumber baca Tab 3. Setiap tulis masuk ke tabel dokumen dan ke
+# antrian dalam satu transaksi; worker latar belakang mendorong antrian ke Google Sheet
+# (FIFO, retry dengan backoff) dan menarik ulang isi sheet saat antrian kosong.
+VERIFIKASI_DB = Path(os.environ.get("VERIFIKASI_DB", SNAPSHOT_DIR / "verifikasi.sqlite"))
+VERIFIKASI_TTL = 60         # detik, isi sheet ditarik ulang ke SQLite setelah selang ini
+SINKRON_BACKOFF_MAKS = 300  # detik, jeda retry terlama saat sheet gagal ditulis
+
+SKEMA_VERIFIKASI = """
+CREATE TABLE IF NOT EXISTS dokumen (
+    id_dokumen TEXT PRIMARY KEY,
+    tanggal_verifikasi TEXT,
+    perusahaan TEXT,
+    keterangan TEXT,
+    no_dokumen TEXT,
+    nilai REAL,
+    masalah TEXT,
+    status TEXT,
+    tanggal_input TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_dokumen_status ON dokumen(status);
+CREATE INDEX IF NOT EXISTS idx_dokumen_perusahaan ON dokumen(perusahaan);
+CREATE INDEX IF NOT EXISTS idx_dokumen_no ON dokumen(no_dokumen);
+CREATE INDEX IF NOT EXISTS idx_dokumen_tanggal ON dokumen(tanggal_verifikasi);
+CREATE TABLE IF NOT EXISTS antrian (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    aksi TEXT NOT NULL,
+    id_dokumen TEXT NOT NULL,
+    data TEXT NOT NULL,
+    dibuat REAL NOT NULL,
+    percobaan INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+"""
+
+def _tanggal_iso(series):
+    """Tanggal campuran format -> teks YYYY-MM-DD (tidak terbaca -> None)"""
+    tgl = pd.to_datetime(series.astype(str), format="mixed", errors="coerce")
+    return tgl.dt.strftime("%Y-%m-%d").astype(object).where(tgl.notna(), None)
+
+def _baris_db(baris):
+    """Nilai satu dokumen dalam urutan KOLOM_VERIFIKASI untuk INSERT"""
+    hasil = []
+    for kolom in KOLOM_VERIFIKASI:
+        nilai = baris.get(kolom)
+        if nilai is None or (isinstance(nilai, float) and np.isnan(nilai)):
+            hasil.append(None)
+        elif kolom == "nilai":
+            hasil.append(float(nilai))
+        else:
+            hasil.append(str(nilai))
+    return hasil
+
+class RepositoriVerifikasi:
+    """
+    Store lokal dokumen bermasalah dengan write-behind ke Google Sheet.
+    Baca dan filter berupa query SQLite ber-indeks; tulis tidak menunggu Google Sheet.
+    """
+
+    def __init__(self, path=VERIFIKASI_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SKEMA_VERIFIKASI)
+
+        self._lock = threading.Lock()   # satu penarikan sheet pada satu waktu
+        self._bangun = threading.Event()
+        self.ditarik_pada = 0.0
+        self.didorong_pada = 0.0
+        self.error = None
+        self._worker = threading.Thread(target=self._jalankan_worker, name="sinkron-verifikasi", daemon=True)
+        self._worker.start()
+
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return closing(db)
+
+    # ---------- baca ----------
+    def ambil(self):
+        """Semua dokumen sebagai DataFrame; tarik dari sheet hanya jika store masih kosong"""
+        if self.ditarik_pada == 0 and self._kosong():
+            self.tarik()
+        with self._db() as db:
+            df = pd.read_sql_query(f"SELECT {', '.join(KOLOM_VERIFIKASI)} FROM dokumen ORDER BY rowid", db)
+        df["nilai"] = df["nilai"].astype("float64")
+        return df
+
+    def cari(self, rentang_tgl=None, perusahaan=None, no_dokumen=None, status=None):
+        """Dokumen bertanggal valid yang cocok dengan filter Tab 3 (query ber-indeks)"""
+        syarat, param = ["tanggal_verifikasi IS NOT NULL"], []
+        if rentang_tgl:
+            syarat.append("tanggal_verifikasi BETWEEN ? AND ?")
+            param += [rentang_tgl[0].isoformat(), rentang_tgl[1].isoformat()]
+        if perusahaan:
+            syarat.append(f"perusahaan IN ({', '.join('?' * len(perusahaan))})")
+            param += list(perusahaan)
+        if no_dokumen:
+            syarat.append("no_dokumen LIKE ? ESCAPE '\\'")
+            param.append("%" + re.sub(r"([\\%_])", r"\\\1", no_dokumen) + "%")
+        if status:
+            syarat.append(f"status IN ({', '.join('?' * len(status))})")
+            param += list(status)
+
+        query = f"SELECT {', '.join(KOLOM_VERIFIKASI)} FROM dokumen WHERE {' AND '.join(syarat)} ORDER BY rowid"
+        with self._db() as db:
+            df = pd.read_sql_query(query, db, params=param)
+        df["nilai"] = df["nilai"].astype("float64")
+        df["tanggal_verifikasi"] = pd.to_datetime(df["tanggal_verifikasi"])
+        return df
+
+    def _kosong(self):
+        with self._db() as db:
+            return db.execute("SELECT NOT EXISTS (SELECT 1 FROM dokumen)").fetchone()[0] == 1
+
+    # ---------- tulis (lokal + antrian) ----------
+    def _tulis(self, aksi, id_dokumen, data, perintah):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, param in perintah:
+                    db.execute(sql, param)
+                db.execute(
+                    "INSERT INTO antrian (aksi, id_dokumen, data, dibuat) VALUES (?, ?, ?, ?)",
+                    (aksi, id_dokumen, json.dumps(data, default=str), time.time()),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        registri_cache().invalidasi("verifikasi")
+        self._bangun.set()
+
+    def tambah(self, baris):
+        baris = {**baris, "id_dokumen": baris.get("id_dokumen") or buat_id_dokumen()}
+        baris["tanggal_verifikasi"] = _tanggal_iso(pd.Series([baris.get("tanggal_verifikasi")]))[0]
+        self._tulis("tambah", baris["id_dokumen"], baris, [(
+            f"INSERT OR REPLACE INTO dokumen ({', '.join(KOLOM_VERIFIKASI)}) "
+            f"VALUES ({', '.join('?' * len(KOLOM_VERIFIKASI))})",
+            _baris_db(baris),
+        )])
+        return baris["id_dokumen"]
+
+    def ubah(self, id_dokumen, perubahan):
+        perubahan = {k: v for k, v in perubahan.items() if k in KOLOM_VERIFIKASI and k != "id_dokumen"}
+        if "tanggal_verifikasi" in perubahan:
+            perubahan["tanggal_verifikasi"] = _tanggal_iso(pd.Series([perubahan["tanggal_verifikasi"]]))[0]
+        nilai = _baris_db(perubahan)
+        kolom = [k for k in KOLOM_VERIFIKASI if k in perubahan]
+        self._tulis("ubah", id_dokumen, perubahan, [(
+            f"UPDATE dokumen SET {', '.join(f'{k} = ?' for k in kolom)} WHERE id_dokumen = ?",
+            [nilai[KOLOM_VERIFIKASI.index(k)] for k in kolom] + [id_dokumen],
+        )])
+
+    def hapus(self, id_dokumen):
+        self._tulis("hapus", id_dokumen, {}, [("DELETE FROM dokumen WHERE id_dokumen = ?", (id_dokumen,))])
+
+    # ---------- sinkron ----------
+    def _seq_antrian(self, db):
+        """Nomor antrian terakhir yang pernah dibuat (naik terus, tidak berulang)"""
+        baris = db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'antrian'").fetchone()
+        return baris[0] if baris else 0
+
+    def tarik(self, paksa=False):
+        """
+        Ganti isi tabel dokumen dengan isi Google Sheet.
+        Dilewati jika ada tulisan lokal yang belum / sedang didorong selama sheet dibaca,
+        agar perubahan lokal tidak tertimpa data sheet yang lebih lama.
+        """
+        with self._lock:
+            if not paksa and time.time() - self.ditarik_pada < VERIFIKASI_TTL:
+                return True
+            with self._db() as db:
+                seq_awal = self._seq_antrian(db)
+                if db.execute("SELECT COUNT(*) FROM antrian").fetchone()[0]:
+                    return False
+
+            df = baca_sheet_verifikasi()
+            if not df.empty and ("id_dokumen" not in df.columns or df["id_dokumen"].isna().any()):
+                # Data lama belum punya ID: lengkapi sekali di sheet lalu baca ulang
+                if lengkapi_id_dokumen():
+                    df = baca_sheet_verifikasi()
+            df = df.reindex(columns=KOLOM_VERIFIKASI)
+            df["tanggal_verifikasi"] = _tanggal_iso(df["tanggal_verifikasi"])
+            df["nilai"] = pd.to_numeric(df["nilai"], errors="coerce")
+            baris = [_baris_db(b) for b in df.dropna(subset=["id_dokumen"]).to_dict("records")]
+
+            with self._db() as db:
+                db.execute("BEGIN IMMEDIATE")
+                if self._seq_antrian(db) != seq_awal:
+                    db.execute("ROLLBACK")
+                    return False
+                db.execute("DELETE FROM dokumen")
+                db.executemany(
+                    f"INSERT OR REPLACE INTO dokumen ({', '.join(KOLOM_VERIFIKASI)}) "
+                    f"VALUES ({', '.join('?' * len(KOLOM_VERIFIKASI))})",
+                    baris,
+                )
+                db.execute("COMMIT")
+            self.ditarik_pada = time.time()
+        registri_cache().invalidasi("verifikasi")
+        return True
+
+    def _dorong_satu(self):
+        """Dorong entri antrian tertua ke sheet; return jeda (detik) sebelum langkah berikutnya"""
+        with self._db() as db:
+            entri = db.execute(
+                "SELECT seq, aksi, id_dokumen, data, percobaan FROM antrian ORDER BY seq LIMIT 1"
+            ).fetchone()
+        if entri is None:
+            return None
+        seq, aksi, id_dokumen, data, percobaan = entri
+        data = json.loads(data)
+
+        try:
+            if aksi == "tambah":
+                sheet_tambah_dokumen(data)
+            elif aksi == "ubah":
+                sheet_ubah_dokumen(id_dokumen, data)
+            else:
+                sheet_hapus_dokumen(id_dokumen)
+        except DokumenTidakDitemukan as e:
+            # Retry tidak akan berhasil: buang entri dan tarik ulang agar store lokal ikut sheet
+            self.error = None if aksi == "hapus" else str(e)
+            self.ditarik_pada = 0.0
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            with self._db() as db:
+                db.execute(
+                    "UPDATE antrian SET percobaan = percobaan + 1, error = ? WHERE seq = ?",
+                    (self.error, seq),
+                )
+            return min(SINKRON_BACKOFF_MAKS, 5 * 2 ** percobaan)
+        else:
+            self.error = None
+
+        with self._db() as db:
+            db.execute("DELETE FROM antrian WHERE seq = ?", (seq,))
+        self.didorong_pada = time.time()
+        return 0
+
+    def _jalankan_worker(self):
+        while True:
+            try:
+                jeda = self._dorong_satu()
+                if jeda is None and time.time() - self.ditarik_pada > VERIFIKASI_TTL:
+                    self.tarik()
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                jeda = SINKRON_BACKOFF_MAKS
+            if jeda != 0:
+                self._bangun.wait(VERIFIKASI_TTL if jeda is None else jeda)
+                self._bangun.clear()
+
+    def status(self):
+        """Ringkasan sinkron untuk indikator di Tab 3"""
+        with self._db() as db:
+            jumlah, percobaan = db.execute("SELECT COUNT(*), MAX(percobaan) FROM antrian").fetchone()
+        return {
+            "antrian": jumlah,
+            "percobaan": percobaan or 0,
+            "error": self.error,
+            "ditarik_pada": self.ditarik_pada,
+            "didorong_pada": self.didorong_pada,
+        }
+
+@st.cache_resource
+def repositori_verifikasi():
+    return RepositoriVerifikasi()
+
+@cache_bernama("opsi_masalah", ["verifikasi"], show_spinner=False)
+def daftar_masalah():
+    """Pilihan masalah unik dari dokumen tersimpan (dropdown form entry Tab 3)"""
+    return sorted(repositori_verifikasi().ambil()["masalah"].dropna().unique().tolist())
+
+def tambah_dokumen_bermasalah(baris):
+    """Simpan dokumen baru ke store lokal; sinkron ke Google Sheet berjalan di latar belakang"""
+    try:
+        repositori_verifikasi().tambah(baris)
         return True
-        
     except Exception as e:
-        st.error(f"❌ Gagal menyimpan ke Google Drive: {e}")
+        st.error(f"❌ Gagal menyimpan data: {e}")
         return False
 
-@st.cache_data(ttl=300)  
-def load_vpu_dari_gdrive():
+def ubah_dokumen_bermasalah(id_dokumen, perubahan):
+    """Ubah kolom dokumen di store lokal; sinkron ke Google Sheet berjalan di latar belakang"""
     try:
-        df = pd.read_excel(VPU_DRIVE_URL)
-        if df.empty:
-            return None
-        return df
+        repositori_verifikasi().ubah(id_dokumen, perubahan)
+        return True
     except Exception as e:
-        st.warning(f"⚠️ Gagal load data VPU: {e}")
-        return None
+        st.error(f"❌ Gagal menyimpan data: {e}")
+        return False
+
+def hapus_dokumen_bermasalah(id_dokumen):
+    """Hapus dokumen dari store lokal; sinkron ke Google Sheet berjalan di latar belakang"""
+    try:
+        repositori_verifikasi().hapus(id_dokumen)
+        return True
+    except Exception as e:
+        st.error(f"❌ Gagal menghapus data: {e}")
+        return False
+
+# =============================
+# DATASET BERSAMA (SHARED ANTAR SESI)
+# =============================
+SESI_TIMEOUT = 1800  # detik tanpa aktivitas sebelum sesi dilepas dari registry
+
+class RegistriDataset:
+    """
+    Satu salinan data mentah (MA, SIMRS, VPU) untuk semua sesi di proses server.
+    Frame bersifat read-only: sesi hanya membaca, override upload manual tetap per sesi.
+    Sesi yang memakai dataset dicatat (reference count) untuk laporan penghematan memori.
+
+    Versi aktif (frames, meta, ukuran, durasi, dimuat_pada) disimpan dalam satu dict dan
+    diganti utuh sekali assign, sehingga pembaca tidak pernah melihat campuran dua versi.
+    Refresh berjalan single-flight di luar lock pembukuan sesi.
+    """
+
+    def __init__(self):
+        self._lock_muat = threading.Lock()  # single-flight unduh/parse
+        self._lock_sesi = threading.Lock()  # pembukuan sesi (dipanggil tiap rerun)
+        self._aktif = None
+        self._sesi = {}  # session_id -> waktu akses terakhir
+
+    def aktif(self):
+        """Versi dataset yang sedang dipakai (dict kosong bila belum pernah dimuat)"""
+        return self._aktif or {"frames": {}, "meta": {}, "ukuran": {}, "durasi": {}, "dimuat_pada": 0.0}
+
+    def pastikan_termuat(self, paksa=False):
+        """
+        Return versi dataset siap pakai.
+        Hanya muat pertama dan refresh paksa yang menunggu unduhan. Versi kadaluarsa
+        disegarkan oleh satu sesi saja; sesi lain langsung memakai versi aktif sampai
+        versi baru selesai dan ditukar.
+        """
+        aktif = self._aktif
+        if aktif is not None and not paksa:
+            if time.time() - aktif["dimuat_pada"] >= SNAPSHOT_TTL and self._lock_muat.acquire(blocking=False):
+                try:
+                    self._muat(paksa=False)
+                finally:
+                    self._lock_muat.release()
+            return self._aktif
+
+        with self._lock_muat:
+            # Sesi lain mungkin sudah memuat selagi menunggu lock
+            if paksa or self._aktif is None:
+                self._muat(paksa=paksa)
+        return self._aktif
+
+    def _muat(self, paksa):
+        """Unduh/parse semua sumber lalu tukar versi aktif (dipanggil di bawah _lock_muat)"""
+        lama = self.aktif()
+        termuat = {
+            nama: (df, lama["meta"].get(nama, {}).get("sha256"))
+            for nama, df in lama["frames"].items() if df is not None
+        }
+        hasil, gagal, durasi = muat_semua_snapshot(paksa=paksa, termuat=termuat)
+        for nama in ("ma", "simrs"):
+            if nama not in hasil:
+                raise RuntimeError(f"{nama.upper()}: {gagal[nama]}")
+
+        frames = {nama: df for nama, (df, _) in hasil.items()}
+        meta = {nama: m for nama, (_, m) in hasil.items()}
+        if "vpu" not in hasil or frames["vpu"].empty:
+            frames["vpu"] = None
+            meta["vpu"] = {"error": gagal.get("vpu", "data VPU kosong")}
+
+        # Isi tidak berubah (hash sama) -> pertahankan objek lama agar tetap satu salinan
+        berubah = []
+        for nama in frames:
+            df_lama = lama["frames"].get(nama)
+            if df_lama is not None and meta[nama].get("sha256") == lama["meta"].get(nama, {}).get("sha256"):
+                frames[nama] = df_lama
+            elif df_lama is not None:
+                berubah.append(nama)
+
+        self._aktif = {
+            "frames": frames,
+            "meta": meta,
+            "ukuran": {
+                nama: int(df.memory_usage(deep=True).sum())
+                for nama, df in frames.items() if df is not None
+            },
+            "durasi": {
+                "paralel": durasi,
+                "sekuensial": sum(m.get("durasi", 0) for m in meta.values()),
+            },
+            "dimuat_pada": time.time(),
+        }
+        # Model turunan versi lama tidak akan dipakai lagi; lepas hanya yang terdampak
+        if berubah:
+            registri_cache().invalidasi(*berubah)
+
+    def daftar_sesi(self, session_id):
+        """Catat sesi sebagai pemakai dataset; return True jika sesi baru"""
+        with self._lock_sesi:
+            baru = session_id not in self._sesi
+            self._sesi[session_id] = time.time()
+            return baru
+
+    def lepas_sesi(self, session_id):
+        with self._lock_sesi:
+            self._sesi.pop(session_id, None)
+
+    def jumlah_sesi(self):
+        """Jumlah sesi aktif (sesi tanpa aktivitas > SESI_TIMEOUT dilepas)"""
+        with self._lock_sesi:
+            batas = time.time() - SESI_TIMEOUT
+            self._sesi = {sid: t for sid, t in self._sesi.items() if t >= batas}
+            return len(self._sesi)
+
+    def total_bytes(self):
+        return sum(self.aktif()["ukuran"].values())
+
+@st.cache_resource
+def registri_dataset():
+    return RegistriDataset()
+
+def id_sesi():
+    """ID sesi Streamlit yang sedang berjalan"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "lokal"
+
+def format_bytes(n):
+    """Format ukuran byte agar mudah dibaca"""
+    for satuan in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or satuan == "GB":
+            return f"{n:,.1f} {satuan}"
+        n /= 1024
 
 # =============================
 # FUNGSI UTILITY
 # =============================
+FORMAT_RUPIAH = "#,##0"
+FORMAT_PERSEN = '0.00"%"'  # nilai persen disimpan 0-100
+FORMAT_TANGGAL = "yyyy-mm-dd"
+KOLOM_RUPIAH = {"pagu", "capaian", "sisa", "nilai", "Capaian (Rp)"}
+KOLOM_PERSEN = {"persen", "% dari Pagu Tahunan"}
+BARIS_PER_BLOK = 10_000  # baris yang dikonversi sekaligus saat menulis ekspor
+
+def _format_sel(nama, series):
+    """Number format Excel untuk satu kolom (None = tanpa format khusus)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return FORMAT_TANGGAL
+    if not pd.api.types.is_numeric_dtype(series):
+        return None
+    if nama in KOLOM_PERSEN:
+        return FORMAT_PERSEN
+    if nama in KOLOM_RUPIAH:
+        return FORMAT_RUPIAH
+    return None
+
+def _nilai_sel(series):
+    """Nilai kolom sebagai objek Python siap tulis; NaN/NaT/NA menjadi sel kosong"""
+    nilai = series.to_numpy(dtype=object, copy=True)
+    nilai[series.isna().to_numpy()] = None
+    return nilai
+
+def tulis_sheet(wb, nama, df):
+    """
+    Tulis satu frame ke sheet write-only openpyxl, per blok BARIS_PER_BLOK baris.
+    Baris langsung di-stream ke file sementara, jadi workbook tidak pernah utuh di memori.
+    """
+    ws = wb.create_sheet(title=str(nama)[:31])
+    ws.page_setup.paperSize = Worksheet.PAPERSIZE_LETTER
+    ws.page_setup.orientation = Worksheet.ORIENTATION_LANDSCAPE
+    ws.page_setup.fitToHeight = 1
+    ws.page_setup.fitToWidth = 1
+
+    judul = []
+    for kolom in df.columns:
+        sel = WriteOnlyCell(ws, value=str(kolom))
+        sel.font = Font(bold=True)
+        judul.append(sel)
+    ws.append(judul)
+
+    # Satu sel bergaya per kolom dipakai ulang: append() menulis baris seketika
+    sel_format = []
+    for j, kolom in enumerate(df.columns):
+        fmt = _format_sel(kolom, df.iloc[:, j])
+        if fmt:
+            sel = WriteOnlyCell(ws)
+            sel.number_format = fmt
+            sel_format.append(sel)
+        else:
+            sel_format.append(None)
+
+    for awal in range(0, len(df), BARIS_PER_BLOK):
+        blok = df.iloc[awal:awal + BARIS_PER_BLOK]
+        kolom_blok = [_nilai_sel(blok.iloc[:, j]) for j in range(blok.shape[1])]
+        for nilai_baris in zip(*kolom_blok):
+            baris = []
+            for sel, nilai in zip(sel_format, nilai_baris):
+                if sel is None or nilai is None:
+                    baris.append(nilai)
+                else:
+                    sel.value = nilai
+                    baris.append(sel)
+            ws.append(baris)
+
 def export_excel(df_dict):
-    """Export multiple dataframes ke Excel dengan multiple sheets"""
+    """Export multiple dataframes ke Excel (streaming, angka asli + format Rupiah)"""
+    wb = Workbook(write_only=True)
+    for sheet, df in df_dict.items():
+        tulis_sheet(wb, sheet, df)
     buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        for sheet, df in df_dict.items():
-            df.to_excel(writer, sheet_name=sheet, index=False)
-
-            ws = writer.sheets[sheet]
-            ws.page_setup.paperSize = ws.PAPERSIZE_LETTER
-            ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-            ws.page_setup.fitToHeight = 1
-            ws.page_setup.fitToWidth = 1
-
+    wb.save(buffer)
     buffer.seek(0)
     return buffer
 
 def export_excel_single(df, sheet_name="Sheet1"):
     """Export single dataframe ke Excel"""
+    return export_excel({sheet_name: df})
+
+def export_csv(df):
+    """Export dataframe ke CSV (UTF-8 dengan BOM agar terbaca benar di Excel)"""
     buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
+    df.to_csv(buffer, index=False, encoding="utf-8-sig", chunksize=BARIS_PER_BLOK)
     buffer.seek(0)
     return buffer
 
-def normalisasi_angka(series):
-    """Konversi format angka Indonesia ke float"""
-    def convert_single(val):
-        try:
-            # Jika sudah numeric (int/float dari Excel), langsung return
-            if isinstance(val, (int, float)):
-                return float(val)
-            
-            val = str(val).strip()
-            
-            if val in ("", "nan", "None", "-"):
-                return 0.0
-            
-            # Cek apakah format Indonesia (titik sebagai pemisah ribuan)
-            # Contoh: "239.999.893" atau "1.234.567,89"
-            if val.count(".") > 1:
-                # Lebih dari 1 titik = format Indonesia (titik = pemisah ribuan)
-                val = val.replace(".", "").replace(",", ".")
-            elif val.count(".") == 1 and val.count(",") == 1:
-                # Ada titik DAN koma = format Indonesia
-                # Contoh: "1.234,56"
-                val = val.replace(".", "").replace(",", ".")
-            elif val.count(",") > 1:
-                # Lebih dari 1 koma = format dengan koma sebagai pemisah ribuan
-                val = val.replace(",", "")
-            elif val.count(".") == 1:
-                # Hanya 1 titik = desimal biasa (misal: 239999893.0)
-                # Biarkan saja
-                pass
-            elif val.count(",") == 1:
-                # Hanya 1 koma = desimal Indonesia (misal: 239999893,0)
-                val = val.replace(",", ".")
-            
-            # Hapus spasi dan karakter non-numerik (kecuali titik dan minus)
-            val = val.replace(" ", "")
-            
+def export_parquet(df):
+    """Export dataframe ke Parquet (kolom campuran angka/teks diseragamkan ke teks)"""
+    buffer = BytesIO()
+    _siapkan_parquet(df).to_parquet(buffer, index=False)
+    buffer.seek(0)
+    return buffer
+
+# =============================
+# EKSPOR FILE (LAZY + CACHE)
+# =============================
+FORMAT_EKSPOR = {
+    # ekstensi: (label, mime)
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "text/csv"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+}
+EKSPOR_CACHE_BYTES = int(os.environ.get("EKSPOR_CACHE_MB", 64)) * 1024 * 1024
+
+class CacheEkspor:
+    """
+    Cache LRU berkas hasil ekspor, dipakai bersama antar sesi.
+    Kunci adalah sidik tampilan dari pemanggil (versi data + filter) + nama file;
+    total ukuran dibatasi EKSPOR_CACHE_BYTES.
+    """
+
+    def __init__(self, maks_bytes=EKSPOR_CACHE_BYTES):
+        self._lock = threading.Lock()
+        self._isi = OrderedDict()
+        self.maks_bytes = maks_bytes
+        self.total_bytes = 0
+
+    def ambil(self, sidik):
+        with self._lock:
+            isi = self._isi.get(sidik)
+            if isi is not None:
+                self._isi.move_to_end(sidik)
+        registri_cache().catat("ekspor_file", "panggil")
+        if isi is None:
+            registri_cache().catat("ekspor_file", "miss")
+        return isi
+
+    def simpan(self, sidik, isi):
+        with self._lock:
+            if sidik in self._isi or len(isi) > self.maks_bytes:
+                return
+            self._isi[sidik] = isi
+            self.total_bytes += len(isi)
+            while self.total_bytes > self.maks_bytes:
+                _, lama = self._isi.popitem(last=False)
+                self.total_bytes -= len(lama)
+                registri_cache().catat("ekspor_file", "buang")
+
+    def bersihkan(self):
+        with self._lock:
+            self._isi.clear()
+            self.total_bytes = 0
+
+@st.cache_resource
+def cache_ekspor():
+    cache = CacheEkspor()
+    # Kunci memuat versi data, jadi entri versi lama tidak pernah terpakai lagi
+    registri_cache().daftar("ekspor_file", [], cache.bersihkan)
+    return cache
+
+def tombol_download(label, sheets, file_name, key, format_file=("xlsx",), sidik=None):
+    """
+    Tombol download satu klik; file baru dibuat saat tombol diklik (data callable,
+    dijalankan Streamlit di luar rerun script).
+    sheets: {nama_sheet: df}, atau callable tanpa argumen yang mengembalikannya agar
+    penyiapan frame (mis. membuang kolom internal) juga baru terjadi saat unduh.
+    CSV/Parquet hanya untuk satu sheet; pilihan format tampil jika format_file berisi
+    lebih dari satu.
+    sidik: sidik murah tampilan (mis. versi data + filter). Jika ada, hasil disimpan di
+    cache_ekspor per sidik + nama file sehingga unduhan ulang tidak menulis file lagi.
+    """
+    ekstensi = format_file[0]
+    if len(format_file) > 1:
+        ekstensi = st.radio(
+            "Format file",
+            format_file,
+            format_func=lambda e: FORMAT_EKSPOR[e][0],
+            horizontal=True,
+            key=f"{key}_format"
+        )
+    nama_file = f"{file_name.rsplit('.', 1)[0]}.{ekstensi}"
+
+    def buat_file():
+        cache = cache_ekspor()
+        kunci = f"{sidik}|{nama_file}" if sidik else None
+        isi = cache.ambil(kunci) if kunci else None
+        if isi is None:
+            isi_sheets = sheets() if callable(sheets) else sheets
+            if ekstensi == "xlsx":
+                isi = export_excel(isi_sheets).getvalue()
+            else:
+                (df,) = isi_sheets.values()
+                isi = (export_csv if ekstensi == "csv" else export_parquet)(df).getvalue()
+            if kunci:
+                cache.simpan(kunci, isi)
+        return isi
+
+    st.download_button(
+        label,
+        data=buat_file,
+        file_name=nama_file,
+        mime=FORMAT_EKSPOR[ekstensi][1],
+        key=key,
+        on_click="ignore"
+    )
+
+POLA_ANGKA_POLOS = r"^[0-9.,+\-eE ]*$"  # hanya digit, pemisah, tanda, eksponen, spasi
+POLA_FLOAT = r"^[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?$"
+JENIS_NILAI = {str: 0, float: 1, int: 1, bool: 1, np.float64: 1}  # 0 teks, 1 angka, 2 lainnya
+
+def _angka_tunggal(val):
+    """Konversi satu nilai format Indonesia ke float (acuan aturan normalisasi_angka)"""
+    try:
+        # Jika sudah numeric (int/float dari Excel), langsung return
+        if isinstance(val, (int, float)):
             return float(val)
-            
-        except (ValueError, TypeError):
+        
+        val = str(val).strip()
+        
+        if val in ("", "nan", "None", "-"):
             return 0.0
-    
-    return series.apply(convert_single)
+        
+        # Cek apakah format Indonesia (titik sebagai pemisah ribuan)
+        # Contoh: "239.999.893" atau "1.234.567,89"
+        if val.count(".") > 1:
+            # Lebih dari 1 titik = format Indonesia (titik = pemisah ribuan)
+            val = val.replace(".", "").replace(",", ".")
+        elif val.count(".") == 1 and val.count(",") == 1:
+            # Ada titik DAN koma = format Indonesia
+            # Contoh: "1.234,56"
+            val = val.replace(".", "").replace(",", ".")
+        elif val.count(",") > 1:
+            # Lebih dari 1 koma = format dengan koma sebagai pemisah ribuan
+            val = val.replace(",", "")
+        elif val.count(".") == 1:
+            # Hanya 1 titik = desimal biasa (misal: 239999893.0)
+            # Biarkan saja
+            pass
+        elif val.count(",") == 1:
+            # Hanya 1 koma = desimal Indonesia (misal: 239999893,0)
+            val = val.replace(",", ".")
+        
+        # Hapus spasi dan karakter non-numerik (kecuali titik dan minus)
+        val = val.replace(" ", "")
+        
+        return float(val)
+        
+    except (ValueError, TypeError):
+        return 0.0
+
+def normalisasi_angka(series):
+    """
+    Konversi format angka Indonesia ke float secara vektor (tanpa apply per sel).
+    Hasil identik dengan _angka_tunggal untuk setiap nilai:
+    - int/float dari Excel langsung dipakai (NaN tetap NaN)
+    - "", "nan", "None", "-" -> 0.0
+    - "239.999.893" / "1.234,56" -> titik = ribuan, koma = desimal
+    - "1,234,567" -> koma = ribuan
+    - "239999893,0" -> koma = desimal
+    - Teks yang tidak bisa dikonversi -> 0.0
+    """
+    if series.dtype.kind in "biuf":
+        return series.astype(np.float64)
+
+    nilai = series.to_numpy(dtype=object)
+    hasil = np.zeros(len(nilai), dtype=np.float64)
+
+    if pd.api.types.infer_dtype(nilai, skipna=False) == "string":
+        is_str = np.ones(len(nilai), dtype=bool)
+        is_num = lainnya = np.zeros(len(nilai), dtype=bool)
+    else:
+        # Satu lintasan type() + lookup dict; jauh lebih murah dari Series.map + isin
+        jenis = np.fromiter(map(JENIS_NILAI.get, map(type, nilai), repeat(2)), dtype=np.int8, count=len(nilai))
+        is_str, is_num, lainnya = jenis == 0, jenis == 1, jenis == 2
+
+    # Angka native: float(val) langsung (numpy memanggil float() per elemen di C)
+    hasil[is_num] = nilai[is_num].astype(np.float64)
+
+    if is_str.any():
+        idx_str = np.flatnonzero(is_str)
+        teks = pa.array(nilai[is_str], type=pa.string())
+
+        # Jalur cepat (kernel Arrow): teks yang hanya berisi digit/pemisah/spasi.
+        # Untuk himpunan karakter ini aturan strip/count/replace/float() identik.
+        polos = pc.match_substring_regex(teks, POLA_ANGKA_POLOS).to_numpy(zero_copy_only=False)
+        if polos.any():
+            t = pc.utf8_trim(teks.filter(pa.array(polos)), " ")
+            kosong = pc.is_in(t, value_set=pa.array(["", "-"])).to_numpy(zero_copy_only=False)
+            jml_titik = pc.count_substring(t, ".").to_numpy(zero_copy_only=False)
+            jml_koma = pc.count_substring(t, ",").to_numpy(zero_copy_only=False)
+
+            format_indo = (jml_titik > 1) | ((jml_titik == 1) & (jml_koma == 1))
+            koma_ribuan = ~format_indo & (jml_koma > 1)
+            koma_desimal = ~format_indo & ~koma_ribuan & (jml_titik == 0) & (jml_koma == 1)
+
+            tanpa_titik = pc.replace_substring(pc.replace_substring(t, ".", ""), ",", ".")
+            t = pc.if_else(pa.array(format_indo), tanpa_titik, t)
+            if koma_ribuan.any():
+                t = pc.if_else(pa.array(koma_ribuan), pc.replace_substring(t, ",", ""), t)
+            if koma_desimal.any():
+                t = pc.if_else(pa.array(koma_desimal), pc.replace_substring(t, ",", "."), t)
+            t = pc.replace_substring(t, " ", "")
+            t = pc.if_else(pa.array(kosong), pa.scalar("0"), t)
+
+            # Parser Arrow hanya menerima teks yang juga diterima float() (hasil sama persis);
+            # jika ada yang gagal, saring dulu dengan pola float standar (selain itu -> 0.0)
+            try:
+                angka = pc.cast(t, pa.float64()).to_numpy(zero_copy_only=False)
+            except pa.ArrowInvalid:
+                valid = pc.match_substring_regex(t, POLA_FLOAT).to_numpy(zero_copy_only=False)
+                angka = np.zeros(len(t), dtype=np.float64)
+                angka[valid] = pc.cast(t.filter(pa.array(valid)), pa.float64()).to_numpy()
+            hasil[idx_str[polos]] = angka
+
+        if (~polos).any():
+            # Teks lain ("Rp 1.000", "NaN", "1_000", dll): aturan per nilai
+            sisa = idx_str[~polos]
+            hasil[sisa] = pd.Series(nilai[sisa], dtype=object).map(_angka_tunggal).to_numpy()
+
+    if lainnya.any():
+        # None, NaT, Timestamp, tipe numpy lain: jarang, pakai aturan per nilai
+        hasil[lainnya] = pd.Series(nilai[lainnya], dtype=object).map(_angka_tunggal).to_numpy()
+
+    return pd.Series(hasil, index=series.index, name=series.name)
 
 def format_rp(x):
     """Format angka ke Rupiah"""
     return f"{x:,.0f}".replace(",", ".")
 
-def warna_persen(val):
-    """Memberikan warna background berdasarkan persentase"""
-    try:
-        val = float(str(val).replace("%", ""))
-    except:
-        return ""
-    if val >= 100:
-        return "background-color: #f8d7da; color: #721c24;"  # merah
-    elif val >= 70:
-        return "background-color: #fff3cd; color: #856404;"  # kuning
+def _teks_rp(nilai):
+    """format_rp untuk satu Series sekaligus"""
+    return nilai.map("{:,.0f}".format).str.replace(",", ".", regex=False)
+
+CSS_MERAH = "background-color: #f8d7da; color: #721c24;"
+CSS_KUNING = "background-color: #fff3cd; color: #856404;"
+CSS_HIJAU = "background-color: #d4edda; color: #155724;"
+CSS_DIHAPUS = "color: red; font-weight: bold"
+
+def warna_persen(persen):
+    """Warna background per persentase (numerik, vektor): >=100 merah, >=70 kuning, lainnya hijau"""
+    # Dibulatkan 2 desimal agar warna sesuai angka yang ditampilkan (99.997 -> 100.00%)
+    p = np.round(np.asarray(persen, dtype="float64"), 2)
+    return np.select([p >= 100, p >= 70], [CSS_MERAH, CSS_KUNING], default=CSS_HIJAU).astype(object)
+
+def gaya_tabel(df, css_kolom=None, css_baris=None):
+    """Styler dengan CSS yang dihitung sekali dalam satu lintasan vektor.
+
+    css_kolom: {kolom: array CSS per baris}; css_baris: array CSS untuk seluruh baris.
+    Keduanya dihitung dari kolom numerik sebelum diformat, bukan callback per sel.
+    """
+    css = np.full(df.shape, "", dtype=object)
+    for kolom, nilai in (css_kolom or {}).items():
+        css[:, df.columns.get_loc(kolom)] = nilai
+    if css_baris is not None:
+        css_baris = np.asarray(css_baris, dtype=object)[:, None]
+        css = np.where(css == "", css_baris, css + " " + css_baris)
+    css = pd.DataFrame(css, index=df.index, columns=df.columns)
+    return df.style.apply(lambda _: css, axis=None)
+
+POLA_KODE_MA = re.compile(
+    r"(?P<kode_ma>(?P<kode_anggaran>\d{6})\.(?P<kode_pengendali>\d+)\.\d+)"
+)
+
+def parse_kode_ma_bulk(series):
+    """
+    Extract kode_ma, kode_anggaran dan kode_pengendali sekaligus dari teks kode MA / SIMRS.
+    Setiap teks unik hanya di-parse sekali (factorize), hasil disebar kembali per baris.
+    """
+    kode, unik = pd.factorize(series)
+    hasil = pd.Series([str(u) for u in unik], dtype=object).str.extract(POLA_KODE_MA)
+
+    # Baris kosong (NaN) diarahkan ke baris tambahan berisi NaN
+    hasil = pd.concat([hasil, pd.DataFrame(index=[len(hasil)], columns=hasil.columns)])
+    hasil = hasil.iloc[np.where(kode < 0, len(unik), kode)]
+    hasil.index = series.index
+    return hasil
+
+# =============================
+# MODEL DATA (CACHE PER VERSI DATA)
+# =============================
+# Parameter berawalan "_" tidak di-hash Streamlit; kunci cache adalah sidik (hash isi)
+# sumber sehingga rerun karena widget memakai frame yang sama tanpa diproses ulang.
+# Frame hasil dipakai bersama antar sesi dan tidak boleh diubah in-place.
+@cache_bernama("model_ma", ["ma"], max_entries=4, show_spinner=False)
+def bangun_ma(_ma_raw, sidik):
+    """Bangun tabel MA SMART (pagu, kode anggaran, pengendali) dari data mentah"""
+    ma = pd.DataFrame({
+        "status_hapus": _ma_raw.iloc[:, 1],
+        "kode_dana": _ma_raw.iloc[:, 2],
+        "kode_ma": _ma_raw.iloc[:, 3],
+        "uraian": _ma_raw.iloc[:, 5],
+        "pagu": normalisasi_angka(_ma_raw.iloc[:, 7]),
+    })
+    ma[["kode_anggaran", "kode_pengendali"]] = parse_kode_ma_bulk(ma["kode_ma"])[
+        ["kode_anggaran", "kode_pengendali"]
+    ]
+    ma["pengendali"] = ma["kode_pengendali"].map(PENGENDALI_MAP)
+    ma["key"] = ma["kode_ma"].astype(str).str.strip()
+    return ma.dropna(subset=["kode_anggaran", "kode_pengendali"])
+
+@cache_bernama("vpu_lookup", ["vpu"], max_entries=4, show_spinner=False)
+def bangun_vpu_lookup(_vpu_raw, sidik):
+    """Bangun lookup no_voucher VPU -> keterangan (VLOOKUP)"""
+    vpu_df = pd.DataFrame({
+        "no_voucher": _vpu_raw.iloc[:, 3].astype(str).str.strip(),
+        "keterangan_vpu": _vpu_raw.iloc[:, 13].astype(str).str.strip()
+    })
+    vpu_df = vpu_df[vpu_df["no_voucher"].str.upper().str.startswith("VPU")]
+    vpu_df["keterangan_vpu"] = vpu_df["keterangan_vpu"].replace("nan", "")
+    return dict(zip(vpu_df["no_voucher"], vpu_df["keterangan_vpu"]))
+
+GRAIN_PERIODE = ["hari", "minggu", "bulan"]
+KODE_PERIODE_KOSONG = np.iinfo(np.int32).min  # kode periode untuk tanggal kosong (NaT)
+
+def kode_periode(tanggal):
+    """
+    Kode integer periode per grain dari kolom tanggal: hari dan bulan sejak 1970-01,
+    minggu Senin–Minggu seperti Period "W" pandas (1970-01-01 jatuh pada Kamis).
+    """
+    hari = tanggal.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    kosong = np.isnat(hari)
+    nomor_hari = hari.astype(np.int64)
+    kode = {
+        "hari": nomor_hari,
+        "minggu": (nomor_hari + 3) // 7,
+        "bulan": hari.astype("datetime64[M]").astype(np.int64),
+    }
+    return {grain: np.where(kosong, KODE_PERIODE_KOSONG, k).astype(np.int32) for grain, k in kode.items()}
+
+def label_periode(grain, kode):
+    """Label teks periode (sama dengan Period.astype(str)) untuk array kode; kode kosong -> NaN"""
+    k = kode.astype(np.int64)
+    if grain == "bulan":
+        teks = np.datetime_as_string(k.astype("datetime64[M]"))
+    elif grain == "hari":
+        teks = np.datetime_as_string(k.astype("datetime64[D]"))
     else:
-        return "background-color: #d4edda; color: #155724;"  # hijau
-
-def parse_kode_ma(kode):
-    """Extract kode anggaran dan kode pengendali dari kode MA"""
-    if pd.isna(kode):
-        return None, None
-    m = re.search(r"(\d{6})\.(\d+)\.\d+", str(kode))
-    if not m:
-        return None, None
-    return m.group(1), m.group(2)
-
-def ekstrak_kode_simrs(text):
-    """Extract kode MA dari text SIMRS"""
-    if pd.isna(text):
-        return None
-    m = re.search(r"(\d{6}\.\d+\.\d+)", str(text))
-    return m.group(1) if m else None
+        awal = (k * 7 - 3).astype("datetime64[D]")
+        teks = np.char.add(np.char.add(np.datetime_as_string(awal), "/"), np.datetime_as_string(awal + 6))
+    teks = teks.astype(object)
+    teks[kode == KODE_PERIODE_KOSONG] = np.nan
+    return teks
+
+@cache_bernama("model_simrs", ["simrs", "vpu"], max_entries=4, show_spinner=False)
+def bangun_simrs(_simrs_raw, _vpu_lookup, sidik):
+    """Bangun tabel transaksi SIMRS (kode MA, pengendali, kode periode + bulan, keterangan VPU)"""
+    kode_simrs = parse_kode_ma_bulk(_simrs_raw.iloc[:, 5])
+    simrs = pd.DataFrame({
+        "kepada": _simrs_raw.iloc[:, 0],
+        "tanggal": pd.to_datetime(_simrs_raw.iloc[:, 1], errors="coerce"),
+        "no_transaksi": _simrs_raw.iloc[:, 2],
+        "nama_anggaran": _simrs_raw.iloc[:, 3],
+        "kode_ma": kode_simrs["kode_ma"],
+        "no_spk": _simrs_raw.iloc[:, 7],
+        "nilai": normalisasi_angka(_simrs_raw.iloc[:, 8]),
+    })
+    simrs = simrs.dropna(subset=["kode_ma"])
+    simrs["key"] = simrs["kode_ma"].astype(str).str.strip()
+    simrs[["kode_anggaran", "kode_pengendali"]] = kode_simrs.loc[
+        simrs.index, ["kode_anggaran", "kode_pengendali"]
+    ]
+    simrs["pengendali"] = simrs["kode_pengendali"].map(PENGENDALI_MAP)
+    for grain, kode in kode_periode(simrs["tanggal"]).items():
+        simrs[f"kode_{grain}"] = kode
+    # Label bulan cukup dibentuk sekali per kode unik
+    bulan_unik, posisi_bulan = np.unique(simrs["kode_bulan"].to_numpy(), return_inverse=True)
+    simrs["bulan"] = label_periode("bulan", bulan_unik)[posisi_bulan]
+    simrs["keterangan_vpu"] = simrs["no_transaksi"].astype(str).str.strip().map(
+        lambda x: _vpu_lookup.get(x, "") if x.upper().startswith("VPU") else ""
+    )
+    return simrs
+
+@cache_bernama("kubus_realisasi", ["ma", "simrs"], max_entries=4, show_spinner=False)
+def bangun_kubus_realisasi(_ma, _simrs, versi):
+    """Kubus realisasi per (baris MA, bulan): total nilai dan jumlah transaksi > 0.
+
+    Kolom terakhir menampung transaksi tanpa tanggal (bulan kosong) agar pilihan
+    "semua bulan" tetap sama dengan menjumlah seluruh transaksi.
+    """
+    daftar_bulan = sorted(_simrs["bulan"].dropna().unique())
+    kode_key, key_unik = pd.factorize(_ma["key"])
+    baris = key_unik.get_indexer(_simrs["key"])
+    kolom = pd.Index(daftar_bulan).get_indexer(_simrs["bulan"])
+    kolom[kolom < 0] = len(daftar_bulan)
+    ada = baris >= 0
+    sel = baris[ada] * (len(daftar_bulan) + 1) + kolom[ada]
+    nilai = _simrs["nilai"].to_numpy(dtype="float64")[ada]
+    ukuran = len(key_unik) * (len(daftar_bulan) + 1)
+    total = np.bincount(sel, weights=np.nan_to_num(nilai), minlength=ukuran)
+    jumlah = np.bincount(sel, weights=nilai > 0, minlength=ukuran).astype("int64")
+    bentuk = (len(key_unik), len(daftar_bulan) + 1)
+    return {
+        "bulan": daftar_bulan,
+        "kode_key": kode_key,
+        "total": total.reshape(bentuk),
+        "jumlah": jumlah.reshape(bentuk),
+    }
+
+def realisasi_dari_kubus(kubus, bulan_dipilih):
+    """Ambil (capaian, jumlah_transaksi) per baris MA untuk subset bulan; kosong = semua"""
+    if bulan_dipilih:
+        kolom = pd.Index(kubus["bulan"]).get_indexer(bulan_dipilih)
+        kolom = kolom[kolom >= 0]
+    else:
+        kolom = slice(None)
+    capaian = kubus["total"][:, kolom].sum(axis=1)[kubus["kode_key"]]
+    jumlah = kubus["jumlah"][:, kolom].sum(axis=1)[kubus["kode_key"]]
+    return capaian, jumlah
+
+def ringkasan_bulanan_pengendali(simrs_bulan, lap_f, daftar_pengendali):
+    """
+    Capaian per (pengendali, bulan) dalam satu groupby untuk grid mini chart Ringkasan.
+    Grid dilengkapi nol agar tiap pengendali punya panel dan sumbu bulan yang sama;
+    kolom judul (nama + baris persen pagu dan total capaian) menjadi header facet.
+    """
+    bulanan = simrs_bulan.groupby(["pengendali", "bulan"], sort=False)["nilai"].sum()
+    daftar_bulan = sorted(bulanan.index.get_level_values("bulan").unique())
+    grid = pd.MultiIndex.from_product([daftar_pengendali, daftar_bulan], names=["pengendali", "bulan"])
+    bulanan = bulanan.reindex(grid, fill_value=0).rename("capaian").reset_index()
+
+    per_pengendali = pd.DataFrame({
+        "capaian": bulanan.groupby("pengendali", sort=False)["capaian"].sum(),
+        "pagu": lap_f.groupby("pengendali")["pagu"].sum(),
+    }).reindex(daftar_pengendali).fillna(0)
+    persen = (per_pengendali["capaian"] / per_pengendali["pagu"].where(per_pengendali["pagu"] > 0) * 100).fillna(0)
+
+    # Nama lengkap menjaga judul tetap unik; pemotongan nama dilakukan di labelExpr chart
+    judul = per_pengendali.index.to_series() + "\n📊 " + persen.map("{:.1f}".format) + "% | Rp " + _teks_rp(per_pengendali["capaian"])
+    bulanan["judul"] = bulanan["pengendali"].map(judul)
+    return bulanan, judul.tolist()
+
+@cache_bernama("rollup_periode", ["simrs", "vpu"], max_entries=4, show_spinner=False)
+def bangun_rollup_periode(_simrs, versi):
+    """
+    Tabel periode per grain untuk grafik distribusi: label terurut, bulan pewarnaan, dan
+    posisi tiap baris SIMRS di tabel itu (-1 = tanpa tanggal). Dibangun sekali per versi
+    data; distribusi untuk filter apa pun cukup bincount posisi pada mask.
+    """
+    rollup = {"aktif": _simrs["nilai"].to_numpy() > 0}
+    for grain in GRAIN_PERIODE:
+        kode_unik, posisi = np.unique(_simrs[f"kode_{grain}"].to_numpy(), return_inverse=True)
+        ada = kode_unik != KODE_PERIODE_KOSONG
+        # KODE_PERIODE_KOSONG adalah int32 terkecil, jadi selalu di posisi 0 bila ada
+        posisi = posisi - int((~ada).sum())
+        label = label_periode(grain, kode_unik[ada])
+        rollup[grain] = {
+            "label": label,
+            # Minggu/hari diwarnai per bulan awal periodenya (YYYY-MM)
+            "bulan_warna": label if grain == "bulan" else pd.Series(label, dtype=object).str[:7].to_numpy(),
+            "posisi": posisi.astype(np.int32),
+        }
+    return rollup
+
+def distribusi_periode(rollup, grain, mask):
+    """Jumlah dan persentase dokumen (nilai > 0) per periode untuk baris SIMRS terpilih"""
+    tabel = rollup[grain]
+    posisi = tabel["posisi"][mask & rollup["aktif"]]
+    jumlah = np.bincount(posisi[posisi >= 0], minlength=len(tabel["label"]))
+    ada = jumlah > 0
+    hasil = pd.DataFrame({"periode": tabel["label"][ada], "jumlah": jumlah[ada]})
+    hasil["persentase"] = (hasil["jumlah"] / hasil["jumlah"].sum() * 100).round(1)
+    hasil["bulan_warna"] = tabel["bulan_warna"][ada]
+    return hasil
+
+KOLOM_FILTER_SIMRS = ["kepada", "nama_anggaran", "pengendali", "kode_anggaran"]
+KOLOM_CARI_SIMRS = ["no_spk", "no_transaksi", "keterangan_vpu"]
+
+def _trigram(kode):
+    """Trigram sebagai int32 (3 byte ASCII berurutan) dari array kode karakter"""
+    return (kode[:-2] << 16) | (kode[1:-1] << 8) | kode[2:]
+
+def bangun_indeks_trigram(series):
+    """
+    Indeks trigram huruf kecil atas teks unik satu kolom.
+    Teks non-ASCII tidak diindeks dan selalu ikut diverifikasi (case-folding Unicode
+    tidak selalu sama dengan str.lower(), misal "ß".upper() == "SS").
+    """
+    # Verifikasi memakai dtype yang sama dengan astype(str) agar aturan pencocokannya sama
+    kode, unik = pd.factorize(series.astype(str))
+    unik = pd.Series(unik)
+    ascii_ = np.fromiter(map(str.isascii, unik), dtype=bool, count=len(unik))
+    id_ascii = np.flatnonzero(ascii_)
+
+    # Semua teks digabung dengan pemisah \x00; trigram yang melewati batas teks dibuang
+    kecil = unik.iloc[id_ascii].str.lower()
+    gabung = ("\x00".join(kecil) + "\x00").encode("ascii")
+    karakter = np.frombuffer(gabung, dtype=np.uint8).astype(np.int32)
+    pemilik = np.repeat(id_ascii.astype(np.int32), kecil.str.len().to_numpy() + 1)
+    tri = _trigram(karakter)
+    sah = (pemilik[:-2] == pemilik[2:]) & (karakter[1:-1] != 0) & (karakter[2:] != 0)
+    tri, pemilik = tri[sah], pemilik[:-2][sah]
+
+    # Urut stabil per trigram: id teks tetap menaik, duplikat dalam satu teks dibuang
+    urut = np.argsort(tri, kind="stable")
+    tri, pemilik = tri[urut], pemilik[urut]
+    baru = np.ones(len(tri), dtype=bool)
+    baru[1:] = (tri[1:] != tri[:-1]) | (pemilik[1:] != pemilik[:-1])
+    tri, pemilik = tri[baru], pemilik[baru]
+    tri_unik, awal = np.unique(tri, return_index=True)
+
+    return {
+        "kode": kode,
+        "unik": unik,
+        "tri": tri_unik,
+        "awal": np.append(awal, len(tri)),
+        "pemilik": pemilik,
+        "non_ascii": np.flatnonzero(~ascii_),
+    }
+
+def cari_indeks_trigram(indeks_teks, kata):
+    """
+    Mask baris yang memuat kata (teks biasa, bukan regex); semantik sama dengan
+    astype(str).str.contains(kata, case=False, regex=False).
+    """
+    unik = indeks_teks["unik"]
+    if len(kata) >= 3 and kata.isascii() and "\x00" not in kata:
+        karakter = np.frombuffer(kata.lower().encode("ascii"), dtype=np.uint8).astype(np.int32)
+        tri = np.unique(_trigram(karakter))
+        posisi = np.searchsorted(indeks_teks["tri"], tri)
+        posisi[posisi == len(indeks_teks["tri"])] = 0
+        if len(indeks_teks["tri"]) and (indeks_teks["tri"][posisi] == tri).all():
+            daftar = sorted(
+                (indeks_teks["pemilik"][indeks_teks["awal"][p]:indeks_teks["awal"][p + 1]] for p in posisi),
+                key=len,
+            )
+            # Daftar pemilik per trigram sudah terurut: saring kandidat dengan searchsorted
+            # (O(k log n)) alih-alih intersect1d yang mengurutkan ulang daftar yang panjang.
+            # Berhenti jika satu langkah tidak mengurangi kandidat (trigram umum, mis.
+            # "RSUD/2024"); sisanya tetap diverifikasi str.contains di bawah.
+            kandidat = daftar[0]
+            for id_teks in daftar[1:]:
+                posisi = np.minimum(np.searchsorted(id_teks, kandidat), len(id_teks) - 1)
+                sisa = kandidat[id_teks[posisi] == kandidat]
+                if len(sisa) == len(kandidat):
+                    break
+                kandidat = sisa
+        else:
+            kandidat = np.empty(0, dtype=np.int32)
+        kandidat = np.concatenate([kandidat, indeks_teks["non_ascii"]])
+    else:
+        # Kata pendek / non-ASCII: verifikasi langsung pada semua teks unik
+        kandidat = np.arange(len(unik))
+
+    # Slot terakhir selalu False untuk teks yang bukan kandidat
+    cocok = np.zeros(len(unik) + 1, dtype=bool)
+    cocok[kandidat] = unik.iloc[kandidat].str.contains(kata, case=False, regex=False, na=False).to_numpy(dtype=bool)
+    return cocok[indeks_teks["kode"]]
+
+@cache_bernama("indeks_filter_simrs", ["simrs", "vpu"], max_entries=4, show_spinner=False)
+def bangun_indeks_filter(_simrs, versi):
+    """Indeks filter Laporan SIMRS: kode kategori per kolom, indeks tanggal terurut, indeks trigram pencarian"""
+    indeks = {"n": len(_simrs), "kategori": {}, "opsi": {}, "teks": {}}
+    for kolom in KOLOM_FILTER_SIMRS:
+        indeks["kategori"][kolom] = pd.factorize(_simrs[kolom])
+        indeks["opsi"][kolom] = sorted(_simrs[kolom].dropna().unique())
+
+    hari = _simrs["tanggal"].to_numpy().astype("datetime64[D]")
+    ada_tgl = np.flatnonzero(~np.isnat(hari))
+    indeks["urut_tgl"] = ada_tgl[np.argsort(hari[ada_tgl], kind="stable")]
+    indeks["hari_urut"] = hari[indeks["urut_tgl"]]
+    indeks["min_tgl"] = _simrs["tanggal"].min()
+    indeks["max_tgl"] = _simrs["tanggal"].max()
+
+    for kolom in KOLOM_CARI_SIMRS:
+        indeks["teks"][kolom] = bangun_indeks_trigram(_simrs[kolom])
+    return indeks
+
+def saring_indeks(indeks, pilihan, rentang_tgl=None, cari=None):
+    """Mask baris SIMRS untuk kombinasi filter (irisan mask, tanpa salinan data)"""
+    mask = np.ones(indeks["n"], dtype=bool)
+    for kolom, nilai in pilihan.items():
+        if not nilai:
+            continue
+        kode, unik = indeks["kategori"][kolom]
+        # Slot terakhir selalu False: kode -1 (NaN) jatuh ke sana lewat indeks negatif
+        dipilih = np.zeros(len(unik) + 1, dtype=bool)
+        posisi = unik.get_indexer(nilai)
+        dipilih[posisi[posisi >= 0]] = True
+        mask &= dipilih[kode]
+
+    if rentang_tgl:
+        awal = np.searchsorted(indeks["hari_urut"], np.datetime64(rentang_tgl[0], "D"), side="left")
+        akhir = np.searchsorted(indeks["hari_urut"], np.datetime64(rentang_tgl[1], "D"), side="right")
+        di_rentang = np.zeros(indeks["n"], dtype=bool)
+        di_rentang[indeks["urut_tgl"][awal:akhir]] = True
+        mask &= di_rentang
+
+    for kolom, kata in (cari or {}).items():
+        if kata:
+            mask &= cari_indeks_trigram(indeks["teks"][kolom], kata)
+    return mask
+
+UKURAN_HALAMAN = [50, 100, 250, 500]
+LABEL_KOLOM_SIMRS = {
+    "tanggal": "Tanggal",
+    "kepada": "Kepada",
+    "no_transaksi": "No. Transaksi",
+    "nama_anggaran": "Nama Anggaran",
+    "kode_ma": "Kode MA",
+    "no_spk": "No. SPK",
+    "nilai": "Nilai (Rp)",
+    "pengendali": "Pengendali",
+    "keterangan_vpu": "Keterangan VPU",
+}
+
+def urutan_baris(df, kolom, menaik=True):
+    """Posisi baris terurut menurut satu kolom mentah (stabil, nilai kosong di akhir)"""
+    if kolom is None:
+        return np.arange(len(df))
+    nilai = df[kolom].reset_index(drop=True)
+    if nilai.dtype == object:
+        # Kolom Excel bisa campuran angka/teks (mis. No. SPK); bandingkan sebagai teks
+        nilai = nilai.map(str, na_action="ignore")
+    urut = nilai.sort_values(ascending=menaik, kind="stable", na_position="last")
+    return urut.index.to_numpy()
+
+def format_laporan_simrs(df):
+    """Salinan Laporan SIMRS siap tampil: tanggal teks dan nilai format Rupiah"""
+    hasil = df.copy()
+    hasil["tanggal"] = hasil["tanggal"].dt.strftime("%Y-%m-%d")
+    hasil["nilai"] = hasil["nilai"].apply(format_rp)
+    return hasil
+
+KOLOM_HIERARKI = ["pengendali", "kode_anggaran", "nama_anggaran"]
+TOP_PERUSAHAAN = 5
+
+def sidik_filter(versi, mask):
+    """Sidik kombinasi filter: versi data + mask baris terpilih (dipadatkan per bit)"""
+    h = hashlib.sha256(versi.encode())
+    h.update(np.packbits(mask).tobytes())
+    h.update(str(len(mask)).encode())
+    return h.hexdigest()[:16]
+
+@cache_bernama("agregasi_sunburst", ["simrs", "vpu"], max_entries=16, show_spinner=False)
+def agregasi_sunburst(_data, sidik):
+    """
+    Agregasi hierarki pengendali → kode → mata anggaran untuk sunburst.
+    Top perusahaan dihitung dari satu groupby-size (grup, kepada) lalu diperingkat,
+    bukan value_counts per grup; urutan seri sama dengan value_counts (kemunculan pertama).
+    Hasil dipakai bersama antar-rerun: jangan diubah di tempat.
+    """
+    data = _data.loc[_data["nilai"] > 0, KOLOM_HIERARKI + ["kepada", "nilai"]]
+    agg = data.groupby(KOLOM_HIERARKI, as_index=False).agg(
+        nilai=("nilai", "sum"),
+        jumlah_dok=("nilai", "count"),
+    )
+
+    hitung = (
+        data.groupby(KOLOM_HIERARKI + ["kepada"], sort=False)
+        .size()
+        .reset_index(name="n")
+        .sort_values(KOLOM_HIERARKI + ["n"], ascending=[True, True, True, False], kind="stable")
+    )
+    hitung = hitung[hitung.groupby(KOLOM_HIERARKI, sort=False).cumcount() < TOP_PERUSAHAAN]
+    top = (
+        hitung["kepada"].astype(str)
+        .groupby([hitung[k] for k in KOLOM_HIERARKI], sort=False)
+        .agg(", ".join)
+        .rename("perusahaan_list")
+    )
+    agg = agg.join(top, on=KOLOM_HIERARKI)
+    agg["perusahaan_list"] = agg["perusahaan_list"].fillna("")
+
+    total_nilai = agg["nilai"].sum()
+    agg["persen"] = (agg["nilai"] / total_nilai * 100).round(2)
+
+    agg["hover_text"] = (
+        "<b>" + agg["nama_anggaran"].astype(str) + "</b><br>"
+        "━━━━━━━━━━━━━━━━━━━━━━<br>"
+        "<b>Pengendali:</b> " + agg["pengendali"].astype(str) + "<br>"
+        "<b>Kode:</b> " + agg["kode_anggaran"].astype(str) + "<br><br>"
+        "<b>💰 Nilai:</b> Rp " + _teks_rp(agg["nilai"]) + "<br>"
+        "<b>📊 Persentase:</b> " + agg["persen"].map("{:.2f}".format) + "%<br>"
+        "<b>📄 Jumlah Dok:</b> " + agg["jumlah_dok"].astype(str) + "<br><br>"
+        "<b>🏢 Top Perusahaan:</b><br>" + agg["perusahaan_list"]
+    )
+    return agg
+
+@cache_bernama("hierarki_sunburst", ["simrs", "vpu"], max_entries=16, show_spinner=False)
+def indeks_hierarki(_agg, sidik):
+    """
+    Rollup tiga level pengendali → kode_anggaran → nama_anggaran dari agregat sunburst.
+    Tiap node menyimpan nilai, persen terhadap total, dan jumlah dokumen; anak disusun
+    terurut sehingga navigasi cukup lookup dict. Dibangun sekali per sidik filter.
+    """
+    total_nilai = _agg["nilai"].sum()
+
+    def rollup(kolom):
+        hasil = _agg.groupby(kolom, sort=True).agg(nilai=("nilai", "sum"), jumlah_dok=("jumlah_dok", "sum"))
+        hasil["persen"] = hasil["nilai"] / total_nilai * 100
+        return hasil
+
+    akar = {"nilai": total_nilai, "jumlah_dok": int(_agg["jumlah_dok"].sum()), "anak": {}}
+    for pengendali, node in rollup("pengendali").to_dict("index").items():
+        akar["anak"][pengendali] = {**node, "anak": {}}
+    for (pengendali, kode), node in rollup(KOLOM_HIERARKI[:2]).to_dict("index").items():
+        akar["anak"][pengendali]["anak"][kode] = {**node, "anak": {}}
+
+    # Daun memakai persen agregat (dibulatkan 2 desimal) seperti di hover chart
+    urut = _agg.sort_values(KOLOM_HIERARKI, kind="stable")
+    for pengendali, kode, nama, nilai, persen, jumlah_dok in zip(
+        urut["pengendali"], urut["kode_anggaran"], urut["nama_anggaran"],
+        urut["nilai"], urut["persen"], urut["jumlah_dok"],
+    ):
+        akar["anak"][pengendali]["anak"][kode]["anak"][nama] = {
+            "nilai": nilai, "persen": persen, "jumlah_dok": int(jumlah_dok)
+        }
+    return akar
+
+PEMISAH_ID_SUNBURST = "\x1f"  # pemisah level pada id node; tidak muncul di teks sheet
+NODE_SUNBURST_BESAR = 1000  # di atas jumlah node ini waktu bangun figure ditampilkan
+
+def id_node_sunburst(jalur):
+    """Id node go.Sunburst untuk path [pengendali, kode, nama] (sebagian atau penuh)"""
+    return PEMISAH_ID_SUNBURST.join(map(str, jalur))
+
+@cache_bernama("figure_sunburst", ["simrs", "vpu"], max_entries=16, show_spinner=False)
+def figure_sunburst(_agg, sidik, ukuran_sama):
+    """
+    Figure go.Sunburst dari array ids / parents / values tiga level, dibangun sekali per
+    (sidik filter, mode ukuran). Drilldown klik chart berjalan di browser; fokus dari
+    navigasi pohon cukup mengganti atribut level (lihat fokus_sunburst).
+    Return (dict figure, jumlah node, detik bangun).
+    """
+    mulai = time.perf_counter()
+    pengendali = _agg["pengendali"].astype(str)
+    kode = _agg["kode_anggaran"].astype(str)
+    daun = pd.DataFrame({
+        "pengendali": pengendali,
+        "kode": kode,
+        "id_kode": pengendali + PEMISAH_ID_SUNBURST + kode,
+        "nilai": _agg["nilai"],
+        "jumlah_dok": _agg["jumlah_dok"],
+        "ukuran": 1 if ukuran_sama else _agg["nilai"],
+    })
+    total_nilai = daun["nilai"].sum()
+    jumlah = {"nilai": "sum", "jumlah_dok": "sum", "ukuran": "sum"}
+    level_k = daun.groupby(["pengendali", "kode", "id_kode"], sort=True).agg(jumlah).reset_index()
+    # Induk dijumlah dari anak langsung agar syarat branchvalues="total" terpenuhi persis
+    level_p = level_k.groupby("pengendali", sort=True).agg(jumlah)
+
+    def hover_cabang(label, nilai, jumlah_dok, induk=None):
+        persen = nilai / total_nilai * 100
+        teks = "<b>" + label + "</b><br>━━━━━━━━━━━━━━━━━━━━━━<br>"
+        if induk is not None:
+            teks = teks + "<b>Pengendali:</b> " + induk + "<br>"
+        return (
+            teks + "<b>💰 Nilai:</b> Rp " + _teks_rp(nilai) + "<br>"
+            "<b>📊 Persentase:</b> " + persen.map("{:.2f}".format) + "%<br>"
+            "<b>📄 Jumlah Dok:</b> " + jumlah_dok.astype(str)
+        )
+
+    label_p = level_p.index.to_series(index=level_p.index)
+    ids = pd.concat([label_p, level_k["id_kode"], daun["id_kode"] + PEMISAH_ID_SUNBURST + _agg["nama_anggaran"].astype(str)])
+    fig = go.Figure(go.Sunburst(
+        ids=ids.to_numpy(),
+        labels=pd.concat([label_p, level_k["kode"], _agg["nama_anggaran"].astype(str)]).to_numpy(),
+        parents=pd.concat([pd.Series("", index=level_p.index), level_k["pengendali"], daun["id_kode"]]).to_numpy(),
+        values=pd.concat([level_p["ukuran"], level_k["ukuran"], daun["ukuran"]]).to_numpy(dtype="float64"),
+        branchvalues="total",
+        hovertext=pd.concat([
+            hover_cabang(label_p, level_p["nilai"], level_p["jumlah_dok"]),
+            hover_cabang(level_k["kode"], level_k["nilai"], level_k["jumlah_dok"], level_k["pengendali"]),
+            _agg["hover_text"],
+        ]).to_numpy(),
+        hovertemplate="%{hovertext}<extra></extra>",
+        textinfo="label+percent entry",
+        insidetextorientation="radial",
+        textfont=dict(size=12, family="Arial, sans-serif"),
+        marker=dict(
+            # Warna = persen node terhadap total (daun memakai persen agregat yang dibulatkan)
+            colors=pd.concat([
+                level_p["nilai"] / total_nilai * 100,
+                level_k["nilai"] / total_nilai * 100,
+                _agg["persen"],
+            ]).to_numpy(),
+            colorscale="RdYlGn_r",
+            showscale=True,
+            colorbar=dict(title="% Total", ticksuffix="%", len=0.7, thickness=15),
+            line=dict(color="white", width=2),
+        ),
+    ))
+    fig.update_layout(
+        height=700,
+        margin=dict(t=50, l=10, r=10, b=10),
+        font=dict(size=11)
+    )
+    return fig.to_dict(), len(ids), time.perf_counter() - mulai
+
+def fokus_sunburst(spesifikasi, jalur):
+    """Salinan dangkal figure cache dengan level awal = node jalur (figure cache tidak diubah)"""
+    trace = {**spesifikasi["data"][0], "level": id_node_sunburst(jalur)} if jalur else spesifikasi["data"][0]
+    judul = " → ".join(map(str, jalur)) if jalur else "Semua Data"
+    return {
+        **spesifikasi,
+        "data": [trace],
+        "layout": {**spesifikasi["layout"], "title": {"text": f"Detail: {judul}"}},
+    }
+
+def rerun_fragment():
+    """
+    st.rerun yang dibatasi ke fragment aktif. Jika tombol fragment terbaca saat run
+    penuh (mis. klik tergabung dengan rerun app), scope "fragment" ditolak Streamlit,
+    jadi jatuh ke rerun app.
+    """
+    ctx = get_script_run_ctx()
+    st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
 
 # =============================
 # LOGIN USER
@@ -244,6 +1898,7 @@ if not st.session_state.login:
     if st.button("Login"):
         if username in USERS and USERS[username] == password:
             st.session_state.login = True
+            st.session_state.username = username
             st.rerun()
         else:
             st.error("❌ Username atau password salah")
@@ -256,6 +1911,7 @@ if not st.session_state.login:
 st.sidebar.success("✅ Login sebagai pengguna")
 
 if st.sidebar.button("🚪 Logout"):
+    registri_dataset().lepas_sesi(id_sesi())
     # Reset semua session state
     for key in list(st.session_state.keys()):
         del st.session_state[key]
@@ -264,8 +1920,8 @@ if st.sidebar.button("🚪 Logout"):
 if st.sidebar.button("🔄 Reset ke Data Google Drive"):
     st.session_state.ma_raw = None
     st.session_state.simrs_raw = None
-    st.session_state.vpu_raw = None
     st.session_state.data_source = "drive"
+    st.session_state.paksa_refresh = True
     st.rerun()    
 
 with st.sidebar.expander("📥 Upload Data Manual (Opsional)", expanded=False):
@@ -284,13 +1940,25 @@ with st.sidebar.expander("📥 Upload Data Manual (Opsional)", expanded=False):
 
     if ma_file is not None and simrs_file is not None:
         try:
-            st.session_state.ma_raw = pd.read_excel(ma_file)
-            st.session_state.simrs_raw = pd.read_excel(simrs_file)
+            sidik_upload = (
+                hashlib.sha256(ma_file.getvalue()).hexdigest(),
+                hashlib.sha256(simrs_file.getvalue()).hexdigest(),
+            )
+            # Parse ulang hanya jika file yang di-upload berubah
+            if st.session_state.get("sidik_upload") != sidik_upload or st.session_state.ma_raw is None:
+                st.session_state.ma_raw = pd.read_excel(ma_file)
+                st.session_state.simrs_raw = pd.read_excel(simrs_file)
+                st.session_state.sidik_upload = sidik_upload
             st.session_state.data_source = "upload"
             st.success("✅ Data manual berhasil digunakan")
         except Exception as e:
             st.error(f"❌ Gagal membaca file: {e}")
 
+if st.session_state.get("username") == "admin":
+    with st.sidebar.expander("🧮 Statistik Cache (Admin)", expanded=False):
+        st.dataframe(registri_cache().statistik(), hide_index=True, use_container_width=True)
+        st.caption("hit/miss dihitung sejak server berjalan; buang = invalidasi atau eviksi LRU")
+
 with st.sidebar.expander("ℹ️ About Aplikasi"):
     st.markdown("""
     **Dashboard Anggaran SIMRS**
@@ -317,103 +1985,96 @@ with st.sidebar.expander("ℹ️ About Aplikasi"):
 # =============================
 # SESSION STATE DATA
 # =============================
+# ma_raw / simrs_raw di session state hanya untuk override upload manual,
+# data Google Drive dibaca dari registri dataset bersama (satu salinan per server)
 if "ma_raw" not in st.session_state:
     st.session_state.ma_raw = None
 
 if "simrs_raw" not in st.session_state:
     st.session_state.simrs_raw = None
 
-if "vpu_raw" not in st.session_state:  
-    st.session_state.vpu_raw = None    
-
 if "data_source" not in st.session_state:
     st.session_state.data_source = "drive"
 
 # =============================
 # LOAD DATA DEFAULT (GOOGLE DRIVE)
 # =============================
-if st.session_state.data_source == "drive" and (
-    st.session_state.ma_raw is None or 
-    st.session_state.simrs_raw is None
-):
+registri = registri_dataset()
+
+if st.session_state.data_source == "drive":
     try:
+        paksa = st.session_state.pop("paksa_refresh", False)
         with st.spinner("📂 Memuat data dari Google Drive..."):
-            st.session_state.ma_raw = pd.read_excel(MA_DRIVE_URL)
-            st.session_state.simrs_raw = pd.read_excel(SIMRS_DRIVE_URL)
-            st.session_state.vpu_raw = load_vpu_dari_gdrive()
-        st.success("📂 Data default dimuat dari Google Drive")
+            dataset = registri.pastikan_termuat(paksa=paksa)
     except Exception as e:
         st.error(f"❌ Gagal memuat data dari Google Drive: {e}")
         st.stop()
 
+    meta_ma, meta_simrs = dataset["meta"]["ma"], dataset["meta"]["simrs"]
+    if registri.daftar_sesi(id_sesi()) or paksa:
+        if meta_ma.get("stale") or meta_simrs.get("stale"):
+            st.warning(
+                f"⚠️ Google Drive tidak dapat diakses, memakai snapshot terakhir "
+                f"(MA: {info_snapshot(meta_ma)}, SIMRS: {info_snapshot(meta_simrs)})"
+            )
+        else:
+            st.success(f"📂 Data default dimuat dari Google Drive (snapshot {info_snapshot(meta_simrs)})")
+        if dataset["meta"].get("vpu", {}).get("error"):
+            st.warning(f"⚠️ Gagal load data VPU: {dataset['meta']['vpu']['error']}")
+        for nama, meta in dataset["meta"].items():
+            if meta.get("error_simpan"):
+                st.warning(f"⚠️ Gagal menyimpan snapshot {nama}: {meta['error_simpan']}")
+
+    ma_raw = dataset["frames"]["ma"]
+    simrs_raw = dataset["frames"]["simrs"]
+else:
+    dataset = registri.aktif()
+    registri.lepas_sesi(id_sesi())
+    ma_raw = st.session_state.ma_raw
+    simrs_raw = st.session_state.simrs_raw
+
+vpu_raw = dataset["frames"].get("vpu")
+
+jumlah_sesi = registri.jumlah_sesi()
+if jumlah_sesi:
+    st.sidebar.caption(
+        f"💾 Dataset bersama {format_bytes(registri.total_bytes())} dipakai {jumlah_sesi} sesi "
+        f"| hemat ±{format_bytes(registri.total_bytes() * (jumlah_sesi - 1))} RAM"
+    )
+if dataset["durasi"]:
+    st.sidebar.caption(
+        f"⏱️ Muat data: {dataset['durasi']['paralel']:.1f} dtk paralel "
+        f"(sekuensial ±{dataset['durasi']['sekuensial']:.1f} dtk)"
+    )
+
 # =============================
-# BACA MA SMART
+# BANGUN MODEL DATA (MA, VPU, SIMRS)
 # =============================
-ma_raw = st.session_state.ma_raw
+if st.session_state.data_source == "drive":
+    sidik_ma = dataset["meta"]["ma"].get("sha256", "")
+    sidik_simrs = dataset["meta"]["simrs"].get("sha256", "")
+else:
+    sidik_ma, sidik_simrs = st.session_state.sidik_upload
+sidik_vpu = dataset["meta"].get("vpu", {}).get("sha256", "") if vpu_raw is not None else ""
+versi_data = hashlib.sha256(f"{sidik_ma}|{sidik_simrs}|{sidik_vpu}".encode()).hexdigest()[:16]
 
 try:
-    ma = pd.DataFrame({
-        "status_hapus": ma_raw.iloc[:, 1],
-        "kode_dana": ma_raw.iloc[:, 2],
-        "kode_ma": ma_raw.iloc[:, 3],
-        "uraian": ma_raw.iloc[:, 5],
-        "pagu": normalisasi_angka(ma_raw.iloc[:, 7]),
-    })
-    ma[["kode_anggaran", "kode_pengendali"]] = ma["kode_ma"].apply(
-        lambda x: pd.Series(parse_kode_ma(x))
-    )
-    ma["pengendali"] = ma["kode_pengendali"].map(PENGENDALI_MAP)
-    ma["key"] = ma["kode_ma"].astype(str).str.strip()
-    ma = ma.dropna(subset=["kode_anggaran", "kode_pengendali"])
+    ma = bangun_ma(ma_raw, sidik_ma)
 except Exception as e:
     st.error(f"❌ Gagal memproses data MA SMART: {e}")
     st.stop()
 
-# =============================
-# BACA DATA VPU (VLOOKUP)
-# =============================
 vpu_lookup = {}
 
-if st.session_state.vpu_raw is not None:
+if vpu_raw is not None:
     try:
-        vpu_raw = st.session_state.vpu_raw
-        vpu_df = pd.DataFrame({
-            "no_voucher": vpu_raw.iloc[:, 3].astype(str).str.strip(),
-            "keterangan_vpu": vpu_raw.iloc[:, 13].astype(str).str.strip()
-        })
-        vpu_df = vpu_df[vpu_df["no_voucher"].str.upper().str.startswith("VPU")]
-        vpu_df["keterangan_vpu"] = vpu_df["keterangan_vpu"].replace("nan", "")
-        vpu_lookup = dict(zip(vpu_df["no_voucher"], vpu_df["keterangan_vpu"]))
+        vpu_lookup = bangun_vpu_lookup(vpu_raw, sidik_vpu)
     except Exception as e:
         st.warning(f"⚠️ Gagal memuat data VPU: {e}")
-        vpu_lookup = {}
-
-# =============================
-# BACA SIMRS
-# =============================
-simrs_raw = st.session_state.simrs_raw
-
-try:
-    simrs = pd.DataFrame({
-        "kepada": simrs_raw.iloc[:, 0],
-        "tanggal": pd.to_datetime(simrs_raw.iloc[:, 1], errors="coerce"),
-        "no_transaksi": simrs_raw.iloc[:, 2],
-        "nama_anggaran": simrs_raw.iloc[:, 3],
-        "kode_ma": simrs_raw.iloc[:, 5].apply(ekstrak_kode_simrs),
-        "no_spk": simrs_raw.iloc[:, 7],
-        "nilai": normalisasi_angka(simrs_raw.iloc[:, 8]),
-    })
-    simrs = simrs.dropna(subset=["kode_ma"])
-    simrs["key"] = simrs["kode_ma"].astype(str).str.strip()
-    simrs[["kode_anggaran", "kode_pengendali"]] = simrs["kode_ma"].apply(
-        lambda x: pd.Series(parse_kode_ma(x))
-    )
-    simrs["pengendali"] = simrs["kode_pengendali"].map(PENGENDALI_MAP)
-    simrs["bulan"] = simrs["tanggal"].dt.to_period("M").astype(str)
-    simrs["keterangan_vpu"] = simrs["no_transaksi"].astype(str).str.strip().map(
-        lambda x: vpu_lookup.get(x, "") if x.upper().startswith("VPU") else ""
-    )
-    
+        vpu_lookup = {}
+
+try:
+    simrs = bangun_simrs(simrs_raw, vpu_lookup, f"{sidik_simrs}|{sidik_vpu}")
 except Exception as e:
     st.error(f"❌ Gagal memproses data SIMRS: {e}")
     st.stop()
@@ -463,8 +2124,10 @@ elif selected_tab == tab_names[2]:
 if st.session_state.active_tab == "tab1":
     st.subheader("🔎 Filter Realisasi Anggaran")
 
+    kubus = bangun_kubus_realisasi(ma, simrs, versi_data)
+
     # Filter Bulan
-    daftar_bulan = sorted(simrs["bulan"].dropna().unique())
+    daftar_bulan = kubus["bulan"]
 
     f_bulan = st.multiselect(
         "Pilih Bulan Realisasi",
@@ -490,23 +2153,14 @@ if st.session_state.active_tab == "tab1":
     # =============================
     # HITUNG REALISASI SESUAI FILTER BULAN
     # =============================
-    simrs_bulan = simrs.copy()
+    capaian, jumlah_transaksi = realisasi_dari_kubus(kubus, f_bulan)
 
-    if f_bulan:
-        simrs_bulan = simrs_bulan[simrs_bulan["bulan"].isin(f_bulan)]
-
-    realisasi_bulan = (
-        simrs_bulan
-        .groupby("key", as_index=False)
-        .agg(
-            capaian=("nilai", "sum"),
-            jumlah_transaksi=("nilai", lambda x: (x > 0).sum())
-        )
-    )
+    # Transaksi bulan terpilih untuk panel analisa (tanpa salinan jika semua bulan)
+    simrs_bulan = simrs[simrs["bulan"].isin(f_bulan)] if f_bulan else simrs
 
-    lap_f = ma.merge(realisasi_bulan, on="key", how="left")
-    lap_f["capaian"] = lap_f["capaian"].fillna(0)
-    lap_f["jumlah_transaksi"] = lap_f["jumlah_transaksi"].fillna(0).astype(int)
+    lap_f = ma.reset_index(drop=True)
+    lap_f["capaian"] = capaian
+    lap_f["jumlah_transaksi"] = jumlah_transaksi
     lap_f["sisa"] = lap_f["pagu"] - lap_f["capaian"]
     lap_f["persen"] = (lap_f["capaian"] / lap_f["pagu"]).fillna(0) * 100
 
@@ -514,17 +2168,14 @@ if st.session_state.active_tab == "tab1":
     if f_pengendali_realisasi:
         lap_f = lap_f[lap_f["pengendali"].isin(f_pengendali_realisasi)]
 
-    # ===== FUNGSI HIGHLIGHT BARIS YANG DIHAPUS =====
-    def highlight_hapus(row):
-        """Highlight merah untuk baris yang dihapus (status H)"""
-        try:
-            kode = row["kode_ma"]
-            status = lap_f[lap_f["kode_ma"] == kode]["status_hapus"].iloc[0]
-            if str(status).strip().upper() == "H":
-                return ['color: red; font-weight: bold'] * len(row)
-        except:
-            pass
-        return [''] * len(row)
+    # Sidik tampilan untuk cache ekspor (lap_f ditentukan versi data + dua filter)
+    sidik_tab1 = hashlib.sha256(
+        f"{versi_data}|{sorted(f_bulan)}|{sorted(f_pengendali_realisasi)}".encode()
+    ).hexdigest()[:16]
+
+    # ===== HIGHLIGHT BARIS YANG DIHAPUS (STATUS H) =====
+    dihapus = lap_f["status_hapus"].astype(str).str.strip().str.upper().eq("H").to_numpy()
+    css_hapus = np.where(dihapus, CSS_DIHAPUS, "")
 
     # ===== TABEL FORMATTED (DEFAULT) =====
     st.markdown("### 📊 Tabel Realisasi Anggaran")
@@ -540,7 +2191,11 @@ if st.session_state.active_tab == "tab1":
     ]
 
     st.dataframe(
-        tampil_formatted.style.map(warna_persen, subset=["persen"]).apply(highlight_hapus, axis=1),
+        gaya_tabel(
+            tampil_formatted,
+            css_kolom={"persen": warna_persen(lap_f["persen"])},
+            css_baris=css_hapus,
+        ),
         use_container_width=True
     )
 
@@ -627,12 +2282,12 @@ if st.session_state.active_tab == "tab1":
         f"👥 Pengendali: {', '.join(f_pengendali_realisasi)}"
     )
 
-    st.download_button(
+    tombol_download(
         "⬇️ Download Excel Realisasi Anggaran",
-        data=export_excel_single(tampil_formatted, "Realisasi_Anggaran"),  # ← FIX: pakai tampil_formatted
+        {"Realisasi_Anggaran": lap_f[tampil_formatted.columns]},  # angka asli, format Rupiah di Excel
         file_name="realisasi_anggaran.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key="download_realisasi_tab1"
+        key="download_realisasi_tab1",
+        sidik=sidik_tab1
     )
 
     # =============================
@@ -643,20 +2298,23 @@ if st.session_state.active_tab == "tab1":
         .agg({"capaian": "sum", "pagu": "sum"})
     )
 
-    chart = (
-        alt.Chart(grafik)
-        .transform_fold(["capaian", "pagu"], as_=["Jenis", "Nilai"])
-        .mark_bar()
-        .encode(
-            y=alt.Y("pengendali:N", sort="-x", axis=alt.Axis(labelLimit=1000)),
-            x=alt.X("Nilai:Q", axis=alt.Axis(format=",.0f")),
-            color="Jenis:N"
-        )
-        .properties(height=30 * len(grafik))
+    tampil_altair(
+        "realisasi_pengendali",
+        [grafik],
+        lambda: (
+            alt.Chart(grafik)
+            .transform_fold(["capaian", "pagu"], as_=["Jenis", "Nilai"])
+            .mark_bar()
+            .encode(
+                y=alt.Y("pengendali:N", sort="-x", axis=alt.Axis(labelLimit=1000)),
+                x=alt.X("Nilai:Q", axis=alt.Axis(format=",.0f")),
+                color="Jenis:N"
+            )
+            .properties(height=30 * len(grafik))
+        ),
+        use_container_width=True
     )
 
-    st.altair_chart(chart, use_container_width=True)
-
     # =============================
     # REKAP PER PENGENDALI
     # =============================
@@ -686,317 +2344,342 @@ if st.session_state.active_tab == "tab1":
 
     st.subheader("📋 Rekap Realisasi per Pengendali")
     st.dataframe(
-        rekap_tampil.style.map(warna_persen, subset=["persen"]),
+        gaya_tabel(rekap_tampil, css_kolom={"persen": warna_persen(rekap_all["persen"])}),
         use_container_width=True
     )
 
-    st.download_button(
+    tombol_download(
         "📥 Export Realisasi Anggaran (Excel)",
-        data=export_excel({
-            "Realisasi Anggaran": tampil_formatted,  # ← FIX: pakai tampil_formatted
-            "Rekap Pengendali": rekap_tampil
-        }),
+        {
+            "Realisasi Anggaran": lap_f[tampil_formatted.columns],
+            "Rekap Pengendali": rekap_all
+        },
         file_name="Realisasi_Anggaran_SIMRS.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key="download_rekap_tab1"
+        key="download_rekap_tab1",
+        sidik=sidik_tab1
     )
 
         # =============================
     # ANALISA REALISASI PER PENGENDALI / MATA ANGGARAN
     # =============================
-    st.markdown("---")
-    st.subheader("📈 Analisa Realisasi per Pengendali / Mata Anggaran")
-
-    # Toggle: Pengendali vs Mata Anggaran
-    analisa_type = st.radio(
-        "Analisa berdasarkan:",
-        ["👥 Per Pengendali", "📋 Per Mata Anggaran"],
-        horizontal=True,
-        key="analisa_type_tab1"
-    )
+    @st.fragment
+    def panel_analisa_realisasi(ma, simrs_bulan, lap_f, daftar_pengendali):
+        """Analisa per pengendali / mata anggaran; widget di dalamnya hanya merender ulang panel ini"""
+        st.markdown("---")
+        st.subheader("📈 Analisa Realisasi per Pengendali / Mata Anggaran")
 
-    if analisa_type == "👥 Per Pengendali":
-        # =============================
-        # ANALISA PER PENGENDALI (kode yang sudah ada)
-        # =============================
-        
-        # Toggle mode tampilan
-        mode_tampilan = st.radio(
-            "Mode Tampilan:",
-            ["📊 Ringkasan", "🔍 Detail per Pengendali"],
+        # Toggle: Pengendali vs Mata Anggaran
+        analisa_type = st.radio(
+            "Analisa berdasarkan:",
+            ["👥 Per Pengendali", "📋 Per Mata Anggaran"],
             horizontal=True,
-            key="mode_chart_tab1"
+            key="analisa_type_tab1"
         )
+
+        if analisa_type == "👥 Per Pengendali":
+            # =============================
+            # ANALISA PER PENGENDALI (kode yang sudah ada)
+            # =============================
+        
+            # Toggle mode tampilan
+            mode_tampilan = st.radio(
+                "Mode Tampilan:",
+                ["📊 Ringkasan", "🔍 Detail per Pengendali"],
+                horizontal=True,
+                key="mode_chart_tab1"
+            )
         
-        if mode_tampilan == "📊 Ringkasan":
-            # MODE RINGKASAN - Chart per Pengendali (otomatis sesuai jumlah)
-            jumlah_pengendali = len(daftar_pengendali)
-            jumlah_kolom = 4
-            jumlah_baris = -(-jumlah_pengendali // jumlah_kolom)  # Ceiling division
+            if mode_tampilan == "📊 Ringkasan":
+                # MODE RINGKASAN - satu chart facet untuk semua pengendali (otomatis sesuai jumlah)
+                jumlah_pengendali = len(daftar_pengendali)
+                jumlah_kolom = 4
             
-            st.caption(f"💡 Tip: Menampilkan {jumlah_pengendali} pengendali | Klik chart untuk detail")
+                st.caption(f"💡 Tip: Menampilkan {jumlah_pengendali} pengendali | Klik chart untuk detail")
             
-            # Buat baris dinamis sesuai jumlah pengendali
-            for row in range(jumlah_baris):
-                cols = st.columns(jumlah_kolom)
-                for col_idx, col in enumerate(cols):
-                    pengendali_idx = row * jumlah_kolom + col_idx
-                    if pengendali_idx < jumlah_pengendali:
-                        pengendali_nama = daftar_pengendali[pengendali_idx]
-                        
-                        with col:
-                            # Filter data pengendali
-                            data_p = simrs_bulan[simrs_bulan["pengendali"] == pengendali_nama]
-                            
-                            # Agregasi bulanan
-                            bulanan = data_p.groupby("bulan").agg(
-                                capaian=("nilai", "sum")
-                            ).reset_index()
-                            
-                            # Ambil pagu
-                            pagu_p = lap_f[lap_f["pengendali"] == pengendali_nama]["pagu"].sum()
-                            persen_p = (bulanan["capaian"].sum() / pagu_p * 100) if pagu_p > 0 else 0
-                            
-                            # Mini chart
-                            mini_chart = alt.Chart(bulanan).mark_bar(size=15).encode(
-                                x=alt.X("bulan:N", title=None, axis=alt.Axis(labelAngle=-45, labelFontSize=8)),
-                                y=alt.Y("capaian:Q", title=None),
-                                color=alt.value("#4472C4"),
-                                tooltip=[
-                                    alt.Tooltip("bulan:N", title="Bulan"),
-                                    alt.Tooltip("capaian:Q", title="Capaian", format=",.0f")
-                                ]
-                            ).properties(height=120)
-                            
-                            # Tampilkan
-                            st.markdown(f"**{pengendali_nama[:30]}...**" if len(pengendali_nama) > 30 else f"**{pengendali_nama}**")
-                            st.altair_chart(mini_chart, use_container_width=True)
-                            st.caption(f"📊 {persen_p:.1f}% | Rp {format_rp(bulanan['capaian'].sum())}")
+                # Satu agregasi (pengendali, bulan) untuk seluruh panel
+                bulanan, urutan_judul = ringkasan_bulanan_pengendali(simrs_bulan, lap_f, daftar_pengendali)
+            
+                if bulanan.empty:
+                    st.info("ℹ️ Tidak ada transaksi pada bulan terpilih")
+                else:
+                    def grafik_mini():
+                        return alt.Chart(bulanan).mark_bar(size=15).encode(
+                            x=alt.X("bulan:N", title=None, axis=alt.Axis(labelAngle=-45, labelFontSize=8)),
+                            y=alt.Y("capaian:Q", title=None),
+                            color=alt.value("#4472C4"),
+                            tooltip=[
+                                alt.Tooltip("pengendali:N", title="Pengendali"),
+                                alt.Tooltip("bulan:N", title="Bulan"),
+                                alt.Tooltip("capaian:Q", title="Capaian", format=",.0f")
+                            ]
+                        ).properties(
+                            width=170,
+                            height=120
+                        ).facet(
+                            facet=alt.Facet(
+                                "judul:N",
+                                sort=urutan_judul,
+                                title=None,
+                                header=alt.Header(
+                                    # Baris 1: nama (dipotong 30 karakter), baris 2: persen | capaian
+                                    labelExpr="[truncate(split(datum.value, '\\n')[0], 33), split(datum.value, '\\n')[1]]",
+                                    labelFontSize=11,
+                                    labelFontWeight="bold",
+                                    labelLimit=0
+                                )
+                            ),
+                            columns=jumlah_kolom
+                        ).resolve_scale(
+                            y="independent"
+                        )
+                
+                    tampil_altair("ringkasan_pengendali", [bulanan, urutan_judul], grafik_mini)
         
-        else:
-            # MODE DETAIL - 1 Chart Besar
-            pengendali_pilih = st.selectbox(
-                "Pilih Pengendali untuk Analisa Detail:",
-                sorted(daftar_pengendali),
-                key="select_pengendali_detail_tab1"
-            )
+            else:
+                # MODE DETAIL - 1 Chart Besar
+                pengendali_pilih = st.selectbox(
+                    "Pilih Pengendali untuk Analisa Detail:",
+                    sorted(daftar_pengendali),
+                    key="select_pengendali_detail_tab1"
+                )
             
-            # Filter data pengendali terpilih
-            data_detail = simrs_bulan[simrs_bulan["pengendali"] == pengendali_pilih]
+                # Filter data pengendali terpilih
+                data_detail = simrs_bulan[simrs_bulan["pengendali"] == pengendali_pilih]
             
-            # Agregasi bulanan
-            bulanan_detail = data_detail.groupby("bulan").agg(
-                capaian=("nilai", "sum"),
-                jumlah_dok=("nilai", "count")
-            ).reset_index()
+                # Agregasi bulanan
+                bulanan_detail = data_detail.groupby("bulan").agg(
+                    capaian=("nilai", "sum"),
+                    jumlah_dok=("nilai", "count")
+                ).reset_index()
             
-            # Ambil pagu total
-            pagu_detail = lap_f[lap_f["pengendali"] == pengendali_pilih]["pagu"].sum()
-            capaian_detail = bulanan_detail["capaian"].sum()
-            persen_detail = (capaian_detail / pagu_detail * 100) if pagu_detail > 0 else 0
-            sisa_detail = pagu_detail - capaian_detail
+                # Ambil pagu total
+                pagu_detail = lap_f[lap_f["pengendali"] == pengendali_pilih]["pagu"].sum()
+                capaian_detail = bulanan_detail["capaian"].sum()
+                persen_detail = (capaian_detail / pagu_detail * 100) if pagu_detail > 0 else 0
+                sisa_detail = pagu_detail - capaian_detail
             
-            # Tambahkan kolom pagu per bulan (dibagi 12 bulan)
-            bulanan_detail["pagu_perbulan"] = pagu_detail / 12
-            bulanan_detail["persentase"] = (bulanan_detail["capaian"] / bulanan_detail["pagu_perbulan"] * 100).round(1)
+                # Tambahkan kolom pagu per bulan (dibagi 12 bulan)
+                bulanan_detail["pagu_perbulan"] = pagu_detail / 12
+                bulanan_detail["persentase"] = (bulanan_detail["capaian"] / bulanan_detail["pagu_perbulan"] * 100).round(1)
             
-            # Chart Detail
-            base = alt.Chart(bulanan_detail).encode(
-                x=alt.X("bulan:N", title="Bulan")
-            )
+                # Chart Detail
+                def grafik_detail():
+                    base = alt.Chart(bulanan_detail).encode(
+                        x=alt.X("bulan:N", title="Bulan")
+                    )
             
-            # Bar capaian
-            bars_capaian = base.mark_bar(color="#4472C4").encode(
-                y=alt.Y("capaian:Q", title="Nilai (Rp)"),
-                tooltip=[
-                    alt.Tooltip("bulan:N", title="Bulan"),
-                    alt.Tooltip("capaian:Q", title="Capaian", format=",.0f"),
-                    alt.Tooltip("jumlah_dok:Q", title="Jumlah Dokumen")
-                ]
-            )
+                    # Bar capaian
+                    bars_capaian = base.mark_bar(color="#4472C4").encode(
+                        y=alt.Y("capaian:Q", title="Nilai (Rp)"),
+                        tooltip=[
+                            alt.Tooltip("bulan:N", title="Bulan"),
+                            alt.Tooltip("capaian:Q", title="Capaian", format=",.0f"),
+                            alt.Tooltip("jumlah_dok:Q", title="Jumlah Dokumen")
+                        ]
+                    )
             
-            # Bar pagu (transparan)
-            bars_pagu = base.mark_bar(color="#ED7D31", opacity=0.3).encode(
-                y=alt.Y("pagu_perbulan:Q"),
-                tooltip=[alt.Tooltip("pagu_perbulan:Q", title="Target Pagu", format=",.0f")]
-            )
+                    # Bar pagu (transparan)
+                    bars_pagu = base.mark_bar(color="#ED7D31", opacity=0.3).encode(
+                        y=alt.Y("pagu_perbulan:Q"),
+                        tooltip=[alt.Tooltip("pagu_perbulan:Q", title="Target Pagu", format=",.0f")]
+                    )
             
-            # Line persentase
-            line_persen = base.mark_line(color="#70AD47", strokeWidth=3, point=True).encode(
-                y=alt.Y("persentase:Q", title="Persentase (%)", axis=alt.Axis(orient="right")),
-                tooltip=[alt.Tooltip("persentase:Q", title="Persentase (%)", format=".1f")]
-            )
+                    # Line persentase
+                    line_persen = base.mark_line(color="#70AD47", strokeWidth=3, point=True).encode(
+                        y=alt.Y("persentase:Q", title="Persentase (%)", axis=alt.Axis(orient="right")),
+                        tooltip=[alt.Tooltip("persentase:Q", title="Persentase (%)", format=".1f")]
+                    )
             
-            chart_detail = alt.layer(bars_pagu, bars_capaian, line_persen).resolve_scale(
-                y="independent"
-            ).properties(height=400, title=f"Realisasi Bulanan: {pengendali_pilih}")
+                    return alt.layer(bars_pagu, bars_capaian, line_persen).resolve_scale(
+                        y="independent"
+                    ).properties(height=400, title=f"Realisasi Bulanan: {pengendali_pilih}")
             
-            st.altair_chart(chart_detail, use_container_width=True)
+                tampil_altair("detail_pengendali", [bulanan_detail, pengendali_pilih], grafik_detail, use_container_width=True)
             
-            # Metrik ringkasan
-            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
-            with col_m1:
-                st.metric("💰 Pagu", f"Rp {format_rp(pagu_detail)}")
-            with col_m2:
-                st.metric("✅ Capaian", f"Rp {format_rp(capaian_detail)}")
-            with col_m3:
-                st.metric("📊 Persentase", f"{persen_detail:.1f}%")
-            with col_m4:
-                st.metric("💸 Sisa", f"Rp {format_rp(sisa_detail)}")
+                # Metrik ringkasan
+                col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+                with col_m1:
+                    st.metric("💰 Pagu", f"Rp {format_rp(pagu_detail)}")
+                with col_m2:
+                    st.metric("✅ Capaian", f"Rp {format_rp(capaian_detail)}")
+                with col_m3:
+                    st.metric("📊 Persentase", f"{persen_detail:.1f}%")
+                with col_m4:
+                    st.metric("💸 Sisa", f"Rp {format_rp(sisa_detail)}")
             
-            # Tabel detail per bulan
-            st.markdown("#### 📋 Detail per Bulan")
-            tabel_bulanan = bulanan_detail.copy()
-            tabel_bulanan["capaian"] = tabel_bulanan["capaian"].apply(format_rp)
-            tabel_bulanan["pagu_perbulan"] = tabel_bulanan["pagu_perbulan"].apply(format_rp)
-            tabel_bulanan["persentase"] = tabel_bulanan["persentase"].apply(lambda x: f"{x:.1f}%")
+                # Tabel detail per bulan
+                st.markdown("#### 📋 Detail per Bulan")
+                tabel_bulanan = bulanan_detail.copy()
+                tabel_bulanan["capaian"] = tabel_bulanan["capaian"].apply(format_rp)
+                tabel_bulanan["pagu_perbulan"] = tabel_bulanan["pagu_perbulan"].apply(format_rp)
+                tabel_bulanan["persentase"] = tabel_bulanan["persentase"].apply(lambda x: f"{x:.1f}%")
             
-            st.dataframe(
-                tabel_bulanan[["bulan", "capaian", "pagu_perbulan", "jumlah_dok", "persentase"]].rename(columns={
-                    "bulan": "Bulan",
-                    "capaian": "Capaian",
-                    "pagu_perbulan": "Target Pagu",
-                    "jumlah_dok": "Jumlah Dokumen",
-                    "persentase": "Persentase"
-                }),
-                use_container_width=True,
-                hide_index=True
-            )
+                st.dataframe(
+                    tabel_bulanan[["bulan", "capaian", "pagu_perbulan", "jumlah_dok", "persentase"]].rename(columns={
+                        "bulan": "Bulan",
+                        "capaian": "Capaian",
+                        "pagu_perbulan": "Target Pagu",
+                        "jumlah_dok": "Jumlah Dokumen",
+                        "persentase": "Persentase"
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
 
-    else:
-        # =============================
-        # ANALISA PER MATA ANGGARAN (dari Tab 4 lama)
-        # =============================
+        else:
+            # =============================
+            # ANALISA PER MATA ANGGARAN (dari Tab 4 lama)
+            # =============================
         
-        # Filter data: HANYA dokumen dengan nilai > 0 (tidak batal)
-        simrs_aktif = simrs_bulan[simrs_bulan["nilai"] > 0].copy()
+            # Filter data: HANYA dokumen dengan nilai > 0 (tidak batal)
+            simrs_aktif = simrs_bulan[simrs_bulan["nilai"] > 0].copy()
         
-        # Ambil unique mata anggaran yang punya transaksi
-        anggaran_list = sorted(simrs_aktif["nama_anggaran"].dropna().unique())
+            # Ambil unique mata anggaran yang punya transaksi
+            anggaran_list = sorted(simrs_aktif["nama_anggaran"].dropna().unique())
         
-        if len(anggaran_list) == 0:
-            st.warning("⚠️ Tidak ada data transaksi aktif")
-        else:
-            # Dropdown pilih mata anggaran
-            selected_anggaran = st.selectbox(
-                "Pilih Mata Anggaran:",
-                anggaran_list,
-                key="select_anggaran_tab1"
-            )
+            if len(anggaran_list) == 0:
+                st.warning("⚠️ Tidak ada data transaksi aktif")
+            else:
+                # Dropdown pilih mata anggaran
+                selected_anggaran = st.selectbox(
+                    "Pilih Mata Anggaran:",
+                    anggaran_list,
+                    key="select_anggaran_tab1"
+                )
             
-            # Filter data anggaran terpilih
-            data_anggaran = simrs_aktif[simrs_aktif["nama_anggaran"] == selected_anggaran]
+                # Filter data anggaran terpilih
+                data_anggaran = simrs_aktif[simrs_aktif["nama_anggaran"] == selected_anggaran]
             
-            # Ambil kode MA untuk cari pagu
-            kode_ma_anggaran = data_anggaran["kode_ma"].iloc[0]
+                # Ambil kode MA untuk cari pagu
+                kode_ma_anggaran = data_anggaran["kode_ma"].iloc[0]
             
-            # Cari pagu dari ma
-            pagu_tahunan = ma[ma["kode_ma"] == kode_ma_anggaran]["pagu"].sum()
+                # Cari pagu dari ma
+                pagu_tahunan = ma[ma["kode_ma"] == kode_ma_anggaran]["pagu"].sum()
             
-            # Agregasi per bulan
-            bulanan_anggaran = data_anggaran.groupby("bulan").agg(
-                capaian=("nilai", "sum"),
-                jumlah_dok=("nilai", "count")
-            ).reset_index()
+                # Agregasi per bulan
+                bulanan_anggaran = data_anggaran.groupby("bulan").agg(
+                    capaian=("nilai", "sum"),
+                    jumlah_dok=("nilai", "count")
+                ).reset_index()
             
-            # Hitung persentase dari pagu tahunan
-            bulanan_anggaran["persen_tahunan"] = (bulanan_anggaran["capaian"] / pagu_tahunan * 100).round(2)
+                # Hitung persentase dari pagu tahunan
+                bulanan_anggaran["persen_tahunan"] = (bulanan_anggaran["capaian"] / pagu_tahunan * 100).round(2)
             
-            # Total
-            total_capaian = bulanan_anggaran["capaian"].sum()
-            total_dok = bulanan_anggaran["jumlah_dok"].sum()
-            total_persen = (total_capaian / pagu_tahunan * 100) if pagu_tahunan > 0 else 0
+                # Total
+                total_capaian = bulanan_anggaran["capaian"].sum()
+                total_dok = bulanan_anggaran["jumlah_dok"].sum()
+                total_persen = (total_capaian / pagu_tahunan * 100) if pagu_tahunan > 0 else 0
             
-            # Info Summary
-            st.markdown("---")
-            col_info1, col_info2, col_info3 = st.columns(3)
+                # Info Summary
+                st.markdown("---")
+                col_info1, col_info2, col_info3 = st.columns(3)
             
-            with col_info1:
-                st.metric("💰 Pagu Tahunan", f"Rp {format_rp(pagu_tahunan)}")
+                with col_info1:
+                    st.metric("💰 Pagu Tahunan", f"Rp {format_rp(pagu_tahunan)}")
             
-            with col_info2:
-                st.metric("✅ Total Capaian", f"Rp {format_rp(total_capaian)}")
+                with col_info2:
+                    st.metric("✅ Total Capaian", f"Rp {format_rp(total_capaian)}")
             
-            with col_info3:
-                st.metric("📊 Persentase Capaian", f"{total_persen:.1f}%")
+                with col_info3:
+                    st.metric("📊 Persentase Capaian", f"{total_persen:.1f}%")
             
-            st.caption(f"📄 Total Dokumen: **{total_dok}** transaksi (dokumen batal tidak dihitung)")
+                st.caption(f"📄 Total Dokumen: **{total_dok}** transaksi (dokumen batal tidak dihitung)")
             
-            # Tabel Detail per Bulan
-            st.markdown("---")
-            st.markdown("### 📋 Detail per Bulan")
+                # Tabel Detail per Bulan
+                st.markdown("---")
+                st.markdown("### 📋 Detail per Bulan")
             
-            # Format tabel
-            tabel_detail = bulanan_anggaran.copy()
-            tabel_detail["capaian_fmt"] = tabel_detail["capaian"].apply(format_rp)
-            tabel_detail["persen_fmt"] = tabel_detail["persen_tahunan"].apply(lambda x: f"{x:.2f}%")
+                # Format tabel
+                tabel_detail = bulanan_anggaran.copy()
+                tabel_detail["capaian_fmt"] = tabel_detail["capaian"].apply(format_rp)
+                tabel_detail["persen_fmt"] = tabel_detail["persen_tahunan"].apply(lambda x: f"{x:.2f}%")
             
-            # Tambahkan emoji indicator
-            def get_indicator(persen):
-                if persen >= 100:
-                    return "🔴"
-                elif persen >= 70:
-                    return "🟡"
-                else:
-                    return "🟢"
+                # Tambahkan emoji indicator
+                def get_indicator(persen):
+                    if persen >= 100:
+                        return "🔴"
+                    elif persen >= 70:
+                        return "🟡"
+                    else:
+                        return "🟢"
             
-            tabel_detail["indicator"] = tabel_detail["persen_tahunan"].apply(get_indicator)
+                tabel_detail["indicator"] = tabel_detail["persen_tahunan"].apply(get_indicator)
             
-            # Tampilkan tabel
-            tabel_tampil = tabel_detail[["bulan", "capaian_fmt", "jumlah_dok", "persen_fmt", "indicator"]].rename(columns={
-                "bulan": "Bulan",
-                "capaian_fmt": "Capaian (Rp)",
-                "jumlah_dok": "Jumlah Dokumen",
-                "persen_fmt": "% dari Pagu Tahunan",
-                "indicator": "Status"
-            })
+                # Tampilkan tabel
+                tabel_tampil = tabel_detail[["bulan", "capaian_fmt", "jumlah_dok", "persen_fmt", "indicator"]].rename(columns={
+                    "bulan": "Bulan",
+                    "capaian_fmt": "Capaian (Rp)",
+                    "jumlah_dok": "Jumlah Dokumen",
+                    "persen_fmt": "% dari Pagu Tahunan",
+                    "indicator": "Status"
+                })
             
-            # Tambahkan baris total
-            total_row = pd.DataFrame([{
-                "Bulan": "TOTAL",
-                "Capaian (Rp)": format_rp(total_capaian),
-                "Jumlah Dokumen": total_dok,
-                "% dari Pagu Tahunan": f"{total_persen:.2f}%",
-                "Status": get_indicator(total_persen)
-            }])
+                # Tambahkan baris total
+                total_row = pd.DataFrame([{
+                    "Bulan": "TOTAL",
+                    "Capaian (Rp)": format_rp(total_capaian),
+                    "Jumlah Dokumen": total_dok,
+                    "% dari Pagu Tahunan": f"{total_persen:.2f}%",
+                    "Status": get_indicator(total_persen)
+                }])
             
-            tabel_final = pd.concat([tabel_tampil, total_row], ignore_index=True)
+                tabel_final = pd.concat([tabel_tampil, total_row], ignore_index=True)
             
-            st.dataframe(
-                tabel_final,
-                use_container_width=True,
-                hide_index=True
-            )
+                st.dataframe(
+                    tabel_final,
+                    use_container_width=True,
+                    hide_index=True
+                )
             
-            # Grafik Trend VERTICAL BAR (lebih jelas)
-            st.markdown("---")
-            st.markdown("### 📈 Grafik Trend Capaian")
+                # Grafik Trend VERTICAL BAR (lebih jelas)
+                st.markdown("---")
+                st.markdown("### 📈 Grafik Trend Capaian")
             
-            # Chart dengan Altair - VERTICAL
-            chart_trend = alt.Chart(bulanan_anggaran).mark_bar(color="#4472C4", size=60).encode(
-                x=alt.X("bulan:N", title="Bulan", axis=alt.Axis(labelAngle=0, labelFontSize=14)),
-                y=alt.Y("capaian:Q", title="Capaian (Rp)", axis=alt.Axis(format=",.0f")),
-                tooltip=[
-                    alt.Tooltip("bulan:N", title="Bulan"),
-                    alt.Tooltip("capaian:Q", title="Capaian", format=",.0f"),
-                    alt.Tooltip("jumlah_dok:Q", title="Jumlah Dokumen"),
-                    alt.Tooltip("persen_tahunan:Q", title="% dari Pagu", format=".2f")
-                ]
-            ).properties(
-                height=400,
-                width=600
-            )
+                # Chart dengan Altair - VERTICAL
+                def grafik_trend():
+                    return alt.Chart(bulanan_anggaran).mark_bar(color="#4472C4", size=60).encode(
+                        x=alt.X("bulan:N", title="Bulan", axis=alt.Axis(labelAngle=0, labelFontSize=14)),
+                        y=alt.Y("capaian:Q", title="Capaian (Rp)", axis=alt.Axis(format=",.0f")),
+                        tooltip=[
+                            alt.Tooltip("bulan:N", title="Bulan"),
+                            alt.Tooltip("capaian:Q", title="Capaian", format=",.0f"),
+                            alt.Tooltip("jumlah_dok:Q", title="Jumlah Dokumen"),
+                            alt.Tooltip("persen_tahunan:Q", title="% dari Pagu", format=".2f")
+                        ]
+                    ).properties(
+                        height=400,
+                        width=600
+                    )
             
-            st.altair_chart(chart_trend, use_container_width=True)
+                tampil_altair("trend_mata_anggaran", [bulanan_anggaran], grafik_trend, use_container_width=True)
             
-            # Download button
-            st.download_button(
-                "⬇️ Download Detail Anggaran (Excel)",
-                data=export_excel_single(tabel_final, "Analisa_Anggaran"),
-                file_name=f"analisa_{selected_anggaran.replace('/', '_')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_analisa_tab1"
-            )
+                # Download button
+                # Versi ekspor memakai angka asli (Capaian, %) agar bisa dijumlah di Excel
+                tabel_ekspor = pd.concat([
+                    pd.DataFrame({
+                        "Bulan": tabel_detail["bulan"],
+                        "Capaian (Rp)": tabel_detail["capaian"],
+                        "Jumlah Dokumen": tabel_detail["jumlah_dok"],
+                        "% dari Pagu Tahunan": tabel_detail["persen_tahunan"],
+                        "Status": tabel_detail["indicator"],
+                    }),
+                    pd.DataFrame([{
+                        "Bulan": "TOTAL",
+                        "Capaian (Rp)": total_capaian,
+                        "Jumlah Dokumen": total_dok,
+                        "% dari Pagu Tahunan": total_persen,
+                        "Status": get_indicator(total_persen),
+                    }]),
+                ], ignore_index=True)
+
+                tombol_download(
+                    "⬇️ Download Detail Anggaran (Excel)",
+                    {"Analisa_Anggaran": tabel_ekspor},
+                    file_name=f"analisa_{selected_anggaran.replace('/', '_')}.xlsx",
+                    key="download_analisa_tab1"
+                )
+
+    panel_analisa_realisasi(ma, simrs_bulan, lap_f, daftar_pengendali)
 
 # ======================================================
 # TAB 2 – LAPORAN SIMRS
@@ -1004,33 +2687,35 @@ if st.session_state.active_tab == "tab1":
 if st.session_state.active_tab == "tab2":
     st.subheader("🔎 Filter Laporan SIMRS")
 
+    indeks_filter = bangun_indeks_filter(simrs, versi_data)
+
     with st.expander("🔍 Filter Data", expanded=False):
         f_kepada = st.multiselect(
             "Perusahaan / Kepada",
-            sorted(simrs["kepada"].dropna().unique()),
+            indeks_filter["opsi"]["kepada"],
             key="filter_kepada_tab2"
         )
 
         f_anggaran = st.multiselect(
             "Nama Anggaran",
-            sorted(simrs["nama_anggaran"].dropna().unique()),
+            indeks_filter["opsi"]["nama_anggaran"],
             key="filter_anggaran_tab2"
         )
 
         f_pengendali = st.multiselect(
             "Pengendali",
-            sorted(simrs["pengendali"].dropna().unique()),
+            indeks_filter["opsi"]["pengendali"],
             key="filter_pengendali_tab2"
         )
 
         f_kode_anggaran = st.multiselect(
             "Kode Anggaran",
-            sorted(simrs["kode_anggaran"].dropna().unique()),
+            indeks_filter["opsi"]["kode_anggaran"],
             key="filter_kode_tab2"
         )
         
-        min_tgl = simrs["tanggal"].min()
-        max_tgl = simrs["tanggal"].max()
+        min_tgl = indeks_filter["min_tgl"]
+        max_tgl = indeks_filter["max_tgl"]
 
         if pd.notna(min_tgl) and pd.notna(max_tgl):
             f_tgl = st.date_input(
@@ -1048,6 +2733,13 @@ if st.session_state.active_tab == "tab2":
             key="filter_no_spk_tab2"
         )
 
+        f_no_transaksi = st.text_input(
+            "🔍 Cari No. Transaksi",
+            placeholder="Ketik sebagian nomor transaksi...",
+            help="Cari berdasarkan nomor transaksi",
+            key="filter_no_transaksi_tab2"
+        )
+
         f_keterangan_vpu = st.text_input(
             "🔍 Cari Keterangan VPU",
             placeholder="Ketik kata kunci keterangan VPU...",
@@ -1058,51 +2750,81 @@ if st.session_state.active_tab == "tab2":
     # =============================
     # TERAPKAN FILTER
     # =============================
-    data = simrs.copy()
-
-    if f_kepada:
-        data = data[data["kepada"].isin(f_kepada)]
-    if f_anggaran:
-        data = data[data["nama_anggaran"].isin(f_anggaran)]
-    if f_pengendali:
-        data = data[data["pengendali"].isin(f_pengendali)]
-    if f_kode_anggaran:
-        data = data[data["kode_anggaran"].isin(f_kode_anggaran)]    
-    if f_tgl and len(f_tgl) == 2:
-        data = data[
-            (data["tanggal"].dt.date >= f_tgl[0]) &
-            (data["tanggal"].dt.date <= f_tgl[1])
-        ]
-    if f_no_spk:
-        data = data[
-            data["no_spk"]
-            .astype(str)
-            .str.contains(f_no_spk, case=False, na=False)
-        ]
+    mask = saring_indeks(
+        indeks_filter,
+        {
+            "kepada": f_kepada,
+            "nama_anggaran": f_anggaran,
+            "pengendali": f_pengendali,
+            "kode_anggaran": f_kode_anggaran,
+        },
+        rentang_tgl=f_tgl if f_tgl and len(f_tgl) == 2 else None,
+        cari={
+            "no_spk": f_no_spk,
+            "no_transaksi": f_no_transaksi,
+            "keterangan_vpu": f_keterangan_vpu,
+        },
+    )
 
-    if f_keterangan_vpu:
-        data = data[
-            data["keterangan_vpu"]
-            .astype(str)
-            .str.contains(f_keterangan_vpu, case=False, na=False)
-        ]
+    # Materialisasi sekali; tanpa filter aktif pakai frame SIMRS apa adanya
+    data = simrs if mask.all() else simrs[mask]
+    sidik_data = sidik_filter(versi_data, mask)
 
-    # ===== TABEL FORMATTED (DEFAULT) =====
+    # ===== TABEL BERHALAMAN =====
+    # Urut dan potong halaman di server pada frame numerik; hanya halaman aktif yang
+    # diformat dan dikirim ke browser.
     st.markdown("### 📊 Tabel Laporan SIMRS")
-    
-    data_formatted = data.copy()
-    data_formatted["tanggal"] = data_formatted["tanggal"].dt.strftime("%Y-%m-%d")
-    data_formatted["nilai"] = data_formatted["nilai"].apply(format_rp)
 
-    # Kolom yang ditampilkan
-    kolom_tampil = ["tanggal", "kepada", "no_transaksi", "nama_anggaran", 
+    kolom_tampil = ["tanggal", "kepada", "no_transaksi", "nama_anggaran",
                     "kode_ma", "no_spk", "nilai", "pengendali"]
     
-    if "keterangan_vpu" in data_formatted.columns:
+    if "keterangan_vpu" in data.columns:
         kolom_tampil.append("keterangan_vpu")
 
+    col_urut, col_arah, col_ukuran, col_halaman = st.columns([2, 1, 1, 1])
+    with col_urut:
+        kolom_urut = st.selectbox(
+            "Urutkan berdasarkan",
+            [None] + kolom_tampil,
+            format_func=lambda k: "Urutan data" if k is None else LABEL_KOLOM_SIMRS[k],
+            key="urut_kolom_tab2"
+        )
+    with col_arah:
+        arah_urut = st.radio(
+            "Arah",
+            ["Naik", "Turun"],
+            horizontal=True,
+            key="urut_arah_tab2"
+        )
+    with col_ukuran:
+        ukuran_halaman = st.selectbox(
+            "Baris per halaman",
+            UKURAN_HALAMAN,
+            index=1,
+            key="ukuran_halaman_tab2"
+        )
+
+    jumlah_baris = len(data)
+    jumlah_halaman = max(1, -(-jumlah_baris // ukuran_halaman))
+    # Filter bisa memperkecil jumlah halaman; nomor halaman lama dijepit ke batas baru
+    if st.session_state.get("halaman_tab2", 1) > jumlah_halaman:
+        st.session_state["halaman_tab2"] = jumlah_halaman
+
+    with col_halaman:
+        halaman = st.number_input(
+            f"Halaman (dari {jumlah_halaman:,})",
+            min_value=1,
+            max_value=jumlah_halaman,
+            step=1,
+            key="halaman_tab2"
+        )
+
+    awal = (halaman - 1) * ukuran_halaman
+    posisi = urutan_baris(data, kolom_urut, arah_urut == "Naik")[awal:awal + ukuran_halaman]
+    data_halaman = format_laporan_simrs(data.iloc[posisi][kolom_tampil])
+
     st.dataframe(
-        data_formatted[kolom_tampil],
+        data_halaman,
         use_container_width=True,
         column_config={
             "tanggal": st.column_config.TextColumn(
@@ -1145,327 +2867,182 @@ if st.session_state.active_tab == "tab2":
         },
         height=400
     )
+    st.caption(
+        f"Menampilkan baris {min(awal + 1, jumlah_baris):,}–{awal + len(posisi):,} "
+        f"dari {jumlah_baris:,} transaksi · halaman {halaman:,} / {jumlah_halaman:,}"
+    )
     st.caption("💡 **Tip:** Hover pada kolom **Keterangan VPU** untuk membaca teks lengkap | Scroll kanan jika perlu")
 
-    # ===== TABEL SORTABLE (COLLAPSIBLE) =====
-    with st.expander("🔢 Lihat Tabel Sortable (Angka Mentah untuk Sorting)"):
-        st.caption("💡 Klik header kolom untuk sort ascending/descending")
-        
-        data_sortable = data.copy()
-        
-        # Convert tanggal ke format date untuk sorting yang benar
-        data_sortable["tanggal_sort"] = data_sortable["tanggal"]
-        data_sortable["tanggal"] = data_sortable["tanggal"].dt.strftime("%Y-%m-%d")
-        
-        # Pilih dan rename kolom
-        data_sortable = data_sortable[[
-            "tanggal", "kepada", "no_transaksi", "nama_anggaran", 
-            "kode_ma", "no_spk", "nilai", "pengendali"
-        ]].copy()
-        
-        # Tambahkan keterangan_vpu ke sortable table
-        kolom_sortable = ["tanggal", "kepada", "no_transaksi", "nama_anggaran",
-                         "kode_ma", "no_spk", "nilai", "pengendali"]
-        
-        if "keterangan_vpu" in data.columns:
-            kolom_sortable.append("keterangan_vpu")
-        
-        data_sortable = data[kolom_sortable].copy()
-        data_sortable["tanggal"] = data_sortable["tanggal"].dt.strftime("%Y-%m-%d")
-        
-        data_sortable = data_sortable.rename(columns={
-            "tanggal": "Tanggal",
-            "kepada": "Kepada",
-            "no_transaksi": "No. Transaksi",
-            "nama_anggaran": "Nama Anggaran",
-            "kode_ma": "Kode MA",
-            "no_spk": "No. SPK",
-            "nilai": "Nilai (Rp)",
-            "pengendali": "Pengendali",
-            "keterangan_vpu": "Keterangan VPU"
-        })
-        
-        st.dataframe(
-            data_sortable,
-            use_container_width=True,
-            height=400
-        )
-
-    st.download_button(
-        "⬇️ Download Excel Laporan SIMRS",
-        data=export_excel_single(data_formatted, "Laporan_SIMRS"),
+    tombol_download(
+        "⬇️ Download Laporan SIMRS",
+        # Kolom kode periode hanya untuk rollup internal; dibuang saat file dibuat saja
+        lambda data=data: {"Laporan_SIMRS": data.drop(columns=[f"kode_{grain}" for grain in GRAIN_PERIODE])},
         file_name="laporan_simrs.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        key="download_laporan_tab2"
+        key="download_laporan_tab2",
+        format_file=("xlsx", "csv", "parquet"),
+        sidik=sidik_data
     )
 
     # =============================
     # SUNBURST CHART - HIERARKI ANGGARAN (INTERACTIVE)
     # =============================
-    st.markdown("---")
-    st.subheader("🎯 Visualisasi Hierarki Anggaran (Interactive)")
+    sidik_sunburst = sidik_data
+
+    @st.fragment
+    def penjelajah_sunburst(data, sidik_sunburst):
+        """Sunburst + navigasi hierarki; klik tombol pohon hanya merender ulang bagian ini"""
+        st.markdown("---")
+        st.subheader("🎯 Visualisasi Hierarki Anggaran (Interactive)")
     
-    # Filter hanya data dengan nilai > 0
-    data_sunburst = data[data["nilai"] > 0].copy()
+        # Agregasi di-cache per sidik filter: klik navigasi hanya rerun, agregat dipakai ulang
+        sunburst_agg = agregasi_sunburst(data, sidik_sunburst)
     
-    if len(data_sunburst) == 0:
-        st.warning("⚠️ Tidak ada data untuk divisualisasikan")
-    else:
-        # ===== SESSION STATE untuk tracking selection =====
-        if "selected_path" not in st.session_state:
-            st.session_state.selected_path = None
-        
-        # ===== TOGGLE MODE =====
-        col_mode, col_spacer = st.columns([2, 3])
-        with col_mode:
-            display_mode = st.radio(
-                "Mode Chart:",
-                ["📊 Proporsional", "📋 Equal Size"],
-                horizontal=True,
-                key="sunburst_mode_tab2"
-            )
-        
-        # Agregasi data
-        sunburst_agg = data_sunburst.groupby(
-            ["pengendali", "kode_anggaran", "nama_anggaran"], 
-            as_index=False
-        ).agg(
-            nilai=("nilai", "sum"),
-            jumlah_dok=("nilai", "count"),
-            perusahaan_list=("kepada", lambda x: ", ".join(x.value_counts().head(5).index.tolist()))
-        )
-        
-        total_nilai = sunburst_agg["nilai"].sum()
-        sunburst_agg["persen"] = (sunburst_agg["nilai"] / total_nilai * 100).round(2)
-        
-        if display_mode == "📋 Equal Size":
-            sunburst_agg["nilai_display"] = 1
+        if len(sunburst_agg) == 0:
+            st.warning("⚠️ Tidak ada data untuk divisualisasikan")
         else:
-            sunburst_agg["nilai_display"] = sunburst_agg["nilai"]
+            # ===== SESSION STATE untuk tracking selection =====
+            if "selected_path" not in st.session_state:
+                st.session_state.selected_path = None
         
-        sunburst_agg["hover_text"] = sunburst_agg.apply(
-            lambda row: (
-                f"<b>{row['nama_anggaran']}</b><br>"
-                f"━━━━━━━━━━━━━━━━━━━━━━<br>"
-                f"<b>Pengendali:</b> {row['pengendali']}<br>"
-                f"<b>Kode:</b> {row['kode_anggaran']}<br><br>"
-                f"<b>💰 Nilai:</b> Rp {format_rp(row['nilai'])}<br>"
-                f"<b>📊 Persentase:</b> {row['persen']:.2f}%<br>"
-                f"<b>📄 Jumlah Dok:</b> {row['jumlah_dok']}<br><br>"
-                f"<b>🏢 Top Perusahaan:</b><br>{row['perusahaan_list']}"
-            ),
-            axis=1
-        )
+            # ===== TOGGLE MODE =====
+            col_mode, col_spacer = st.columns([2, 3])
+            with col_mode:
+                display_mode = st.radio(
+                    "Mode Chart:",
+                    ["📊 Proporsional", "📋 Equal Size"],
+                    horizontal=True,
+                    key="sunburst_mode_tab2"
+                )
         
-        # ===== CONTAINER dengan STICKY CHART =====
-        # Gunakan HTML/CSS untuk sticky positioning
-        st.markdown("""
-        <style>
-        .sticky-chart {
-            position: sticky;
-            top: 60px;
-            z-index: 100;
-            background: white;
-            padding: 10px;
-            border-radius: 8px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        </style>
-        """, unsafe_allow_html=True)
+            hierarki = indeks_hierarki(sunburst_agg, sidik_sunburst)
+            total_nilai = hierarki["nilai"]
         
-        col_tree, col_chart = st.columns([1, 2])
+            # ===== CONTAINER dengan STICKY CHART =====
+            # Gunakan HTML/CSS untuk sticky positioning
+            st.markdown("""
+            <style>
+            .sticky-chart {
+                position: sticky;
+                top: 60px;
+                z-index: 100;
+                background: white;
+                padding: 10px;
+                border-radius: 8px;
+                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+            }
+            </style>
+            """, unsafe_allow_html=True)
         
-        # ===== KOLOM KIRI: TREE NAVIGATION =====
-        with col_tree:
-            st.markdown("#### 📑 Navigasi Hierarki")
-            st.caption("💡 Klik item untuk zoom chart di sebelah kanan")
-            
-            # Build tree structure
-            tree_data = {}
-            for _, row in sunburst_agg.iterrows():
-                pengendali = row['pengendali']
-                kode = row['kode_anggaran']
-                nama = row['nama_anggaran']
-                
-                if pengendali not in tree_data:
-                    tree_data[pengendali] = {}
-                if kode not in tree_data[pengendali]:
-                    tree_data[pengendali][kode] = []
-                tree_data[pengendali][kode].append({
-                    'nama': nama,
-                    'persen': row['persen'],
-                    'nilai': row['nilai'],
-                    'jumlah_dok': row['jumlah_dok']
-                })
+            col_tree, col_chart = st.columns([1, 2])
+        
+            # ===== KOLOM KIRI: TREE NAVIGATION =====
+            with col_tree:
+                st.markdown("#### 📑 Navigasi Hierarki")
+                st.caption("💡 Klik item untuk zoom chart di sebelah kanan")
             
-            # Display tree with CLICKABLE buttons
-            for pengendali in sorted(tree_data.keys()):
-                total_pengendali = sunburst_agg[sunburst_agg['pengendali'] == pengendali]['nilai'].sum()
-                persen_pengendali = (total_pengendali / total_nilai * 100)
-                
-                # Button untuk PENGENDALI (level 1)
-                btn_pengendali = st.button(
-                    f"▼ {pengendali}  \n`{persen_pengendali:.1f}%` | Rp {format_rp(total_pengendali)}",
-                    key=f"btn_pengendali_{pengendali}",
-                    use_container_width=True,
-                    type="secondary"
-                )
+                # Rollup hierarki dibangun sekali per sidik filter; expand node = lookup dict
+                for pengendali, node_p in hierarki["anak"].items():
+                    # Button untuk PENGENDALI (level 1)
+                    btn_pengendali = st.button(
+                        f"▼ {pengendali}  \n`{node_p['persen']:.1f}%` | Rp {format_rp(node_p['nilai'])}",
+                        key=f"btn_pengendali_{pengendali}",
+                        use_container_width=True,
+                        type="secondary"
+                    )
                 
-                if btn_pengendali:
-                    st.session_state.selected_path = [pengendali]
-                    st.rerun()
+                    if btn_pengendali:
+                        st.session_state.selected_path = [pengendali]
+                        rerun_fragment()
                 
-                # Tampilkan sub-items jika pengendali dipilih
-                if st.session_state.selected_path and st.session_state.selected_path[0] == pengendali:
-                    for kode in sorted(tree_data[pengendali].keys()):
-                        items = tree_data[pengendali][kode]
-                        total_kode = sum(item['nilai'] for item in items)
-                        persen_kode = (total_kode / total_nilai * 100)
-                        
-                        # Button untuk KODE ANGGARAN (level 2)
-                        btn_kode = st.button(
-                            f"  📦 {kode} `{persen_kode:.1f}%`",
-                            key=f"btn_kode_{pengendali}_{kode}",
-                            use_container_width=True
-                        )
+                    # Tampilkan sub-items jika pengendali dipilih
+                    if st.session_state.selected_path and st.session_state.selected_path[0] == pengendali:
+                        for kode, node_k in node_p["anak"].items():
+                            # Button untuk KODE ANGGARAN (level 2)
+                            btn_kode = st.button(
+                                f"  📦 {kode} `{node_k['persen']:.1f}%`",
+                                key=f"btn_kode_{pengendali}_{kode}",
+                                use_container_width=True
+                            )
                         
-                        if btn_kode:
-                            st.session_state.selected_path = [pengendali, kode]
-                            st.rerun()
+                            if btn_kode:
+                                st.session_state.selected_path = [pengendali, kode]
+                                rerun_fragment()
                         
-                        # Tampilkan mata anggaran jika kode dipilih
-                        if (len(st.session_state.selected_path) >= 2 and 
-                            st.session_state.selected_path[1] == kode):
+                            # Tampilkan mata anggaran jika kode dipilih
+                            if (len(st.session_state.selected_path) >= 2 and 
+                                st.session_state.selected_path[1] == kode):
                             
-                            for item in items:
-                                # Button untuk MATA ANGGARAN (level 3)
-                                btn_nama = st.button(
-                                    f"    • {item['nama'][:35]}... `{item['persen']:.1f}%` | {item['jumlah_dok']} dok",
-                                    key=f"btn_nama_{pengendali}_{kode}_{item['nama'][:30]}",
-                                    use_container_width=True
-                                )
+                                for nama, item in node_k["anak"].items():
+                                    # Button untuk MATA ANGGARAN (level 3)
+                                    btn_nama = st.button(
+                                        f"    • {nama[:35]}... `{item['persen']:.1f}%` | {item['jumlah_dok']} dok",
+                                        key=f"btn_nama_{pengendali}_{kode}_{nama[:30]}",
+                                        use_container_width=True
+                                    )
                                 
-                                if btn_nama:
-                                    st.session_state.selected_path = [pengendali, kode, item['nama']]
-                                    st.rerun()
+                                    if btn_nama:
+                                        st.session_state.selected_path = [pengendali, kode, nama]
+                                        rerun_fragment()
                         
-                        st.markdown("---")
+                            st.markdown("---")
         
-        # ===== KOLOM KANAN: STICKY CHART =====
-        with col_chart:
-            # Container untuk sticky chart
-            chart_container = st.container()
+            # ===== KOLOM KANAN: STICKY CHART =====
+            with col_chart:
+                # Container untuk sticky chart
+                chart_container = st.container()
             
-            with chart_container:
-                st.markdown('<div class="sticky-chart">', unsafe_allow_html=True)
-                st.markdown("#### 📊 Sunburst Chart")
-                
-                # Buat chart FOCUSED berdasarkan selection
-                if st.session_state.selected_path:
-                    # Filter data berdasarkan path yang dipilih
-                    filtered_data = sunburst_agg.copy()
-                    
-                    if len(st.session_state.selected_path) >= 1:
-                        filtered_data = filtered_data[filtered_data['pengendali'] == st.session_state.selected_path[0]]
-                    
-                    if len(st.session_state.selected_path) >= 2:
-                        filtered_data = filtered_data[filtered_data['kode_anggaran'] == st.session_state.selected_path[1]]
-                    
-                    if len(st.session_state.selected_path) >= 3:
-                        filtered_data = filtered_data[filtered_data['nama_anggaran'] == st.session_state.selected_path[2]]
-                    
-                    # Rebuild hover text untuk filtered data
-                    filtered_data["hover_text"] = filtered_data.apply(
-                        lambda row: (
-                            f"<b>{row['nama_anggaran']}</b><br>"
-                            f"━━━━━━━━━━━━━━━━━━━━━━<br>"
-                            f"<b>Pengendali:</b> {row['pengendali']}<br>"
-                            f"<b>Kode:</b> {row['kode_anggaran']}<br><br>"
-                            f"<b>💰 Nilai:</b> Rp {format_rp(row['nilai'])}<br>"
-                            f"<b>📊 Persentase:</b> {row['persen']:.2f}%<br>"
-                            f"<b>📄 Jumlah Dok:</b> {row['jumlah_dok']}<br><br>"
-                            f"<b>🏢 Top Perusahaan:</b><br>{row['perusahaan_list']}"
-                        ),
-                        axis=1
-                    )
-                    
-                    chart_data = filtered_data
-                    chart_title = " → ".join(st.session_state.selected_path)
-                else:
-                    chart_data = sunburst_agg
-                    chart_title = "Semua Data"
-                
-                # Info path saat ini
-                if st.session_state.selected_path:
-                    st.info(f"🎯 **Fokus:** {' → '.join(st.session_state.selected_path)}")
-                    if st.button("↶ Reset ke View Semua", key="reset_view"):
-                        st.session_state.selected_path = None
-                        st.rerun()
-                
-                # Buat Sunburst Chart
-                fig = px.sunburst(
-                    chart_data,
-                    path=["pengendali", "kode_anggaran", "nama_anggaran"],
-                    values="nilai_display",
-                    color="persen",
-                    color_continuous_scale="RdYlGn_r",
-                    hover_data={
-                        "nilai": ":,.0f",
-                        "jumlah_dok": True,
-                        "persen": ":.2f",
-                        "perusahaan_list": False,
-                        "nilai_display": False
-                    },
-                    custom_data=["hover_text"],
-                    title=f"Detail: {chart_title}"
-                )
+                with chart_container:
+                    st.markdown('<div class="sticky-chart">', unsafe_allow_html=True)
+                    st.markdown("#### 📊 Sunburst Chart")
                 
-                fig.update_traces(
-                    textinfo="label+percent entry",
-                    hovertemplate='%{customdata[0]}<extra></extra>',
-                    marker=dict(line=dict(color='white', width=2)),
-                    textfont=dict(size=12, family="Arial, sans-serif"),
-                    insidetextorientation='radial'
-                )
+                    jalur = st.session_state.selected_path or []
                 
-                fig.update_layout(
-                    height=700,
-                    margin=dict(t=50, l=10, r=10, b=10),
-                    coloraxis_colorbar=dict(
-                        title="% Total",
-                        ticksuffix="%",
-                        len=0.7,
-                        thickness=15
-                    ),
-                    font=dict(size=11)
-                )
+                    # Info path saat ini
+                    if jalur:
+                        st.info(f"🎯 **Fokus:** {' → '.join(jalur)}")
+                        if st.button("↶ Reset ke View Semua", key="reset_view"):
+                            st.session_state.selected_path = None
+                            rerun_fragment()
                 
-                st.plotly_chart(fig, use_container_width=True, key=f"chart_{len(st.session_state.selected_path) if st.session_state.selected_path else 0}")
+                    # Figure (ids/parents/values) dibangun sekali per filter + mode; klik segmen chart
+                    # di-zoom oleh Plotly di browser, navigasi pohon hanya mengganti level awal
+                    spesifikasi, jumlah_node, detik_bangun = figure_sunburst(
+                        sunburst_agg, sidik_sunburst, display_mode == "📋 Equal Size"
+                    )
+                    if jumlah_node > NODE_SUNBURST_BESAR:
+                        st.caption(
+                            f"🧩 {jumlah_node:,} node · figure dibangun {detik_bangun * 1000:,.0f} ms "
+                            "(sekali per filter dan mode)"
+                        )
+                    st.plotly_chart(fokus_sunburst(spesifikasi, jalur), use_container_width=True, key=f"chart_{len(jalur)}")
                 
-                st.markdown('</div>', unsafe_allow_html=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
         
-        # Info & Tips
-        st.markdown("---")
-        st.info(
-            "💡 **Cara Pakai:**\n"
-            "1. **Klik Pengendali** di navigasi kiri → Chart fokus ke pengendali tersebut\n"
-            "2. **Klik Kode Anggaran** (📦) → Chart fokus lebih detail\n"
-            "3. **Klik Mata Anggaran** (•) → Lihat detail spesifik\n"
-            "4. **Scroll ke bawah** → Chart tetap terlihat (sticky)\n"
-            "5. **Klik 'Reset'** → Kembali ke view semua"
-        )
+            # Info & Tips
+            st.markdown("---")
+            st.info(
+                "💡 **Cara Pakai:**\n"
+                "1. **Klik Pengendali** di navigasi kiri → Chart fokus ke pengendali tersebut\n"
+                "2. **Klik Kode Anggaran** (📦) → Chart fokus lebih detail\n"
+                "3. **Klik Mata Anggaran** (•) → Lihat detail spesifik\n"
+                "4. **Klik segmen chart** → Zoom langsung di browser; klik tengah untuk naik level\n"
+                "5. **Scroll ke bawah** → Chart tetap terlihat (sticky)\n"
+                "6. **Klik 'Reset'** → Kembali ke view semua"
+            )
         
-        # Statistik
-        st.markdown("---")
-        col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
-        with col_stat1:
-            st.metric("📊 Pengendali", len(sunburst_agg["pengendali"].unique()))
-        with col_stat2:
-            st.metric("🔢 Kode Anggaran", len(sunburst_agg["kode_anggaran"].unique()))
-        with col_stat3:
-            st.metric("📋 Mata Anggaran", len(sunburst_agg["nama_anggaran"].unique()))
-        with col_stat4:
-            st.metric("💰 Total Nilai", f"Rp {format_rp(total_nilai)}")
+            # Statistik
+            st.markdown("---")
+            col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
+            with col_stat1:
+                st.metric("📊 Pengendali", len(sunburst_agg["pengendali"].unique()))
+            with col_stat2:
+                st.metric("🔢 Kode Anggaran", len(sunburst_agg["kode_anggaran"].unique()))
+            with col_stat3:
+                st.metric("📋 Mata Anggaran", len(sunburst_agg["nama_anggaran"].unique()))
+            with col_stat4:
+                st.metric("💰 Total Nilai", f"Rp {format_rp(total_nilai)}")
+
+    penjelajah_sunburst(data, sidik_sunburst)
 
     # =============================
     # METRIK
@@ -1491,73 +3068,55 @@ if st.session_state.active_tab == "tab2":
     st.markdown("---")
     st.subheader("📊 Grafik Distribusi Dokumen")
 
-    # Pilihan periode
-    col_periode, col_spacer = st.columns([1, 3])
-    with col_periode:
-        periode = st.radio(
-            "Tampilkan per:",
-            ["Minggu", "Bulan"],
-            horizontal=True,
-            key="periode_chart_tab2"
-        )
-
-    # Siapkan data untuk chart
-    data_chart = data[data["nilai"] > 0].copy()
+    @st.fragment
+    def grafik_distribusi_dokumen(rollup, mask):
+        """Grafik distribusi dokumen per hari/minggu/bulan; ganti periode hanya merender ulang bagian ini"""
+        # Pilihan periode
+        col_periode, col_spacer = st.columns([1, 3])
+        with col_periode:
+            label_x = st.radio(
+                "Tampilkan per:",
+                ["Hari", "Minggu", "Bulan"],
+                index=1,
+                horizontal=True,
+                key="periode_chart_tab2"
+            )
 
-    if periode == "Minggu":
-        # Agregasi per minggu
-        data_chart["periode"] = data_chart["tanggal"].dt.to_period("W").astype(str)
-        label_x = "Minggu"
-    else:
-        # Agregasi per bulan
-        data_chart["periode"] = data_chart["tanggal"].dt.to_period("M").astype(str)
-        label_x = "Bulan"
-
-    # Hitung agregasi
-    periode_agg = data_chart.groupby("periode").agg(
-        jumlah=("nilai", "count")
-    ).reset_index()
-
-    # Hitung persentase
-    total_dok_chart = periode_agg["jumlah"].sum()
-    periode_agg["persentase"] = (periode_agg["jumlah"] / total_dok_chart * 100).round(1)
-
-    # Tambahkan kolom bulan untuk pewarnaan (hanya untuk mode Minggu)
-    if periode == "Minggu":
-        # Extract bulan dari periode minggu (format: 2026-01, 2026-02)
-        periode_agg["bulan_warna"] = periode_agg["periode"].str[:7]  # Ambil YYYY-MM
-    else:
-        periode_agg["bulan_warna"] = periode_agg["periode"]
+        # Tabel periode per grain sudah disiapkan per versi data; di sini hanya reduksi mask
+        periode_agg = distribusi_periode(rollup, label_x.lower(), mask)
 
-    # Buat chart dengan warna per bulan
-    base = alt.Chart(periode_agg).encode(
-        x=alt.X("periode:N", title=label_x, axis=alt.Axis(labelAngle=-45))
-    )
+        # Buat chart dengan warna per bulan
+        def grafik_distribusi():
+            base = alt.Chart(periode_agg).encode(
+                x=alt.X("periode:N", title=label_x, axis=alt.Axis(labelAngle=-45))
+            )
 
-    bars = base.mark_bar().encode(
-        y=alt.Y("jumlah:Q", title="Jumlah Dokumen"),
-        color=alt.Color(
-            "bulan_warna:N",
-            title="Bulan",
-            scale=alt.Scale(scheme="category10"),  # Warna otomatis berbeda per bulan
-            legend=alt.Legend(orient="top")
-        ),
-        tooltip=[
-            alt.Tooltip("periode:N", title=label_x),
-            alt.Tooltip("jumlah:Q", title="Jumlah Dokumen"),
-            alt.Tooltip("persentase:Q", format=".1f", title="Persentase (%)"),
-            alt.Tooltip("bulan_warna:N", title="Bulan")  # Tambah info bulan
-        ]
-    )
+            bars = base.mark_bar().encode(
+                y=alt.Y("jumlah:Q", title="Jumlah Dokumen"),
+                color=alt.Color(
+                    "bulan_warna:N",
+                    title="Bulan",
+                    scale=alt.Scale(scheme="category10"),  # Warna otomatis berbeda per bulan
+                    legend=alt.Legend(orient="top")
+                ),
+                tooltip=[
+                    alt.Tooltip("periode:N", title=label_x),
+                    alt.Tooltip("jumlah:Q", title="Jumlah Dokumen"),
+                    alt.Tooltip("persentase:Q", format=".1f", title="Persentase (%)"),
+                    alt.Tooltip("bulan_warna:N", title="Bulan")  # Tambah info bulan
+                ]
+            )
 
-    line = base.mark_line(color="#ED7D31", strokeWidth=3, point=True).encode(
-        y=alt.Y("persentase:Q", title="Persentase (%)", axis=alt.Axis(orient="right")),
-        tooltip=[alt.Tooltip("persentase:Q", format=".1f", title="Persentase (%)")]
-    )
+            line = base.mark_line(color="#ED7D31", strokeWidth=3, point=True).encode(
+                y=alt.Y("persentase:Q", title="Persentase (%)", axis=alt.Axis(orient="right")),
+                tooltip=[alt.Tooltip("persentase:Q", format=".1f", title="Persentase (%)")]
+            )
 
-    chart = alt.layer(bars, line).resolve_scale(y="independent").properties(height=400)
+            return alt.layer(bars, line).resolve_scale(y="independent").properties(height=400)
+    
+        tampil_altair("distribusi_dokumen", [periode_agg, label_x], grafik_distribusi, use_container_width=True)
 
-    st.altair_chart(chart, use_container_width=True)
+    grafik_distribusi_dokumen(bangun_rollup_periode(simrs, versi_data), mask)
 
 # ======================================================
 # TAB 3 – DOKUMEN BERMASALAH
@@ -1584,10 +3143,9 @@ if st.session_state.active_tab == "tab3":
                 min_value=0.0,
                 step=1000.0
             )
-            # Load unique masalah dari data yang sudah ada
+            # Load unique masalah dari data yang sudah ada (salinan cache repositori)
             try:
-                df_existing = pd.read_excel(VERIFIKASI_DRIVE_URL)
-                unique_masalah = sorted(df_existing["masalah"].dropna().unique().tolist())
+                unique_masalah = daftar_masalah()
             except:
                 unique_masalah = []
 
@@ -1612,7 +3170,7 @@ if st.session_state.active_tab == "tab3":
                 if not perusahaan or not no_dokumen or not masalah:
                     st.error("❌ Perusahaan, No. Dokumen, dan Masalah harus diisi!")
                 else:
-                    data_baru = pd.DataFrame([{
+                    data_baru = {
                         "tanggal_verifikasi": tgl_verifikasi.strftime("%Y-%m-%d"),
                         "perusahaan": perusahaan,
                         "keterangan": keterangan,
@@ -1621,24 +3179,12 @@ if st.session_state.active_tab == "tab3":
                         "masalah": masalah,
                         "status": "SELESAI" if status_selesai else "BELUM",
                         "tanggal_input": date.today().strftime("%Y-%m-%d")
-                    }])
-
-                    # Load data lama dari Google Drive
-                    try:
-                        df_lama = pd.read_excel(VERIFIKASI_DRIVE_URL)
-                        if not df_lama.empty:
-                            df_all = pd.concat([df_lama, data_baru], ignore_index=True)
-                        else:
-                            df_all = data_baru
-                    except Exception as e:
-                        # Jika file belum ada, gunakan data baru saja
-                        df_all = data_baru
-
-                    # Simpan ke Google Drive
-                    if simpan_dokumen_bermasalah(df_all):
-                        st.success("✅ Data berhasil disimpan ke Google Drive")
+                    }
+
+                    # Tambah satu baris di akhir sheet (data lama tidak diunduh / ditulis ulang)
+                    if tambah_dokumen_bermasalah(data_baru):
+                        st.success("✅ Data berhasil disimpan (sinkron ke Google Drive berjalan di latar belakang)")
                         st.balloons()
-                        st.cache_data.clear()
                         st.rerun()
 
     st.markdown("---")
@@ -1646,14 +3192,35 @@ if st.session_state.active_tab == "tab3":
     col_btn1, col_btn2 = st.columns([1, 5])
     with col_btn1:
         if st.button("🔄 Refresh", key="refresh_tab3"):
+            try:
+                # Dilewati selama antrian belum kosong (lihat indikator sinkron)
+                repositori_verifikasi().tarik(paksa=True)
+            except Exception as e:
+                st.warning(f"⚠️ Gagal menarik data dari Google Drive: {e}")
             st.rerun()
+    with col_btn2:
+        sinkron = repositori_verifikasi().status()
+        if sinkron["error"] and sinkron["antrian"]:
+            st.caption(
+                f"🔴 {sinkron['antrian']} perubahan belum tersinkron ke Google Drive "
+                f"(percobaan {sinkron['percobaan']}): {sinkron['error']}"
+            )
+        elif sinkron["antrian"]:
+            st.caption(f"🟡 Menyinkronkan {sinkron['antrian']} perubahan ke Google Drive...")
+        elif sinkron["error"]:
+            st.caption(f"🟠 {sinkron['error']}")
+        elif sinkron["ditarik_pada"]:
+            st.caption(
+                "🟢 Tersinkron dengan Google Drive · data ditarik "
+                f"{datetime.fromtimestamp(sinkron['ditarik_pada']):%H:%M:%S}"
+            )
 
     # =============================
     # LOAD DATA DARI GOOGLE DRIVE
     # =============================
     try:
         with st.spinner("📂 Memuat data dokumen bermasalah..."):
-            df_verif = pd.read_excel(VERIFIKASI_DRIVE_URL)
+            df_verif = repositori_verifikasi().ambil()
             
             # Pastikan kolom yang diperlukan ada
             required_columns = ['tanggal_verifikasi', 'perusahaan', 'keterangan', 
@@ -1661,26 +3228,26 @@ if st.session_state.active_tab == "tab3":
             
             # Jika DataFrame kosong atau tidak punya kolom yang benar, inisialisasi
             if df_verif.empty or not all(col in df_verif.columns for col in required_columns):
-                df_verif = pd.DataFrame(columns=required_columns + ['tanggal_input'])
+                df_verif = pd.DataFrame(columns=KOLOM_VERIFIKASI)
+            elif "id_dokumen" not in df_verif.columns:
+                df_verif["id_dokumen"] = np.nan
                 
     except Exception as e:
         st.warning(f"⚠️ Tidak bisa membaca data dari Google Drive: {e}")
         st.info("💡 Pastikan Google Sheet sudah di-share ke service account")
         # Buat DataFrame kosong dengan struktur yang benar
-        df_verif = pd.DataFrame(columns=['tanggal_verifikasi', 'perusahaan', 'keterangan', 
-                                        'no_dokumen', 'nilai', 'masalah', 'status', 'tanggal_input'])
+        df_verif = pd.DataFrame(columns=KOLOM_VERIFIKASI)
 
     if df_verif.empty:
         st.info("ℹ️ Belum ada data dokumen bermasalah. Silakan entry data baru di form di atas.")
     else:
         # Tampilkan jumlah total data
-        st.success(f"📊 Total data: **{len(df_verif)}** dokumen bermasalah tersimpan di Google Drive")
+        st.success(f"📊 Total data: **{len(df_verif)}** dokumen bermasalah tersimpan")
         
-        st.download_button(
+        tombol_download(
             "⬇️ Download Excel Dokumen Bermasalah",
-            data=export_excel_single(df_verif, "Dokumen_Bermasalah"),
+            {"Dokumen_Bermasalah": df_verif},
             file_name="dokumen_bermasalah.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             key="download_dokumen_tab3"
         )
 
@@ -1746,212 +3313,183 @@ if st.session_state.active_tab == "tab3":
             )
 
         # =============================
-        # TERAPKAN FILTER
+        # TERAPKAN FILTER (QUERY SQLITE BER-INDEKS)
         # =============================
-        data = df_verif.copy()
-        
-        # Tambahkan index sebagai ID untuk edit/delete
-        data = data.reset_index(drop=False)
-        data.rename(columns={'index': 'id'}, inplace=True)
-
-        if f_tgl and len(f_tgl) == 2:
-            data = data[
-                (data["tanggal_verifikasi"].dt.date >= f_tgl[0]) &
-                (data["tanggal_verifikasi"].dt.date <= f_tgl[1])
-            ]
-
-        if f_perusahaan:
-            data = data[data["perusahaan"].isin(f_perusahaan)]
-
-        if f_no:
-            data = data[
-                data["no_dokumen"]
-                .astype(str)
-                .str.contains(f_no, case=False, na=False)
-            ]
-
-        if f_status:
-            data = data[data["status"].isin(f_status)]
+        data = repositori_verifikasi().cari(
+            rentang_tgl=f_tgl if f_tgl and len(f_tgl) == 2 else None,
+            perusahaan=f_perusahaan,
+            no_dokumen=f_no,
+            status=f_status,
+        )
 
         # =============================
         # EDIT/UPDATE/HAPUS DATA
         # =============================
-        st.markdown("---")
-        st.markdown("### ✏️ Edit, Update Status, atau Hapus Data")
+        @st.fragment
+        def panel_edit_dokumen(data):
+            """Pilih dokumen dan aksi edit/status/hapus; hanya simpan yang merender ulang seluruh halaman"""
+            st.markdown("---")
+            st.markdown("### ✏️ Edit, Update Status, atau Hapus Data")
         
-        if not data.empty:
-            # Pilih dokumen untuk edit/update/hapus
-            opsi_dokumen = data.apply(
-                lambda row: f"[{row['no_dokumen']}] {row['perusahaan']} - {row['status']}", 
-                axis=1
-            ).tolist()
+            if not data.empty:
+                # Pilih dokumen untuk edit/update/hapus (kunci: id_dokumen, bukan no_dokumen + perusahaan)
+                data_pilih = data.dropna(subset=["id_dokumen"]).set_index("id_dokumen")
+                label_dokumen = {
+                    id_dok: f"[{row['no_dokumen']}] {row['perusahaan']} - {row['status']}"
+                    for id_dok, row in data_pilih.iterrows()
+                }
             
-            col_select, col_action = st.columns([3, 1])
+                col_select, col_action = st.columns([3, 1])
             
-            with col_select:
-                selected_doc = st.selectbox(
-                    "Pilih Dokumen:",
-                    options=["-- Pilih Dokumen --"] + opsi_dokumen,
-                    key="select_doc_edit_tab3"
-                )
+                with col_select:
+                    selected_doc = st.selectbox(
+                        "Pilih Dokumen:",
+                        options=[None] + list(label_dokumen),
+                        format_func=lambda id_dok: "-- Pilih Dokumen --" if id_dok is None else label_dokumen[id_dok],
+                        key="select_doc_edit_tab3"
+                    )
             
-            if selected_doc != "-- Pilih Dokumen --":
-                # Ambil index dokumen yang dipilih
-                selected_idx = opsi_dokumen.index(selected_doc)
-                selected_row = data.iloc[selected_idx]
+                if selected_doc is not None:
+                    selected_row = data_pilih.loc[selected_doc]
                 
-                # PENTING: Cari index di df_verif original (bukan di data yang sudah di-filter)
-                original_idx = df_verif[
-                    (df_verif['no_dokumen'] == selected_row['no_dokumen']) &
-                    (df_verif['perusahaan'] == selected_row['perusahaan'])
-                ].index[0]
-                
-                with col_action:
-                    st.write("")  # Spacing
-                    st.write("")  # Spacing
-                    action_type = st.radio(
-                        "Aksi:",
-                        ["Edit Data Lengkap", "Ubah Status", "Hapus Data"],
-                        horizontal=False,
-                        key="action_radio_tab3"
-                    )
+                    with col_action:
+                        st.write("")  # Spacing
+                        st.write("")  # Spacing
+                        action_type = st.radio(
+                            "Aksi:",
+                            ["Edit Data Lengkap", "Ubah Status", "Hapus Data"],
+                            horizontal=False,
+                            key="action_radio_tab3"
+                        )
                 
-                st.markdown("---")
+                    st.markdown("---")
                 
-                # AKSI: EDIT DATA LENGKAP
-                if action_type == "Edit Data Lengkap":
-                    st.info(f"📝 **Edit Data Dokumen:** {selected_row['no_dokumen']}")
+                    # AKSI: EDIT DATA LENGKAP
+                    if action_type == "Edit Data Lengkap":
+                        st.info(f"📝 **Edit Data Dokumen:** {selected_row['no_dokumen']}")
                     
-                    with st.form("form_edit_dokumen", clear_on_submit=False):
-                        col_edit1, col_edit2 = st.columns(2)
+                        with st.form("form_edit_dokumen", clear_on_submit=False):
+                            col_edit1, col_edit2 = st.columns(2)
                         
-                        with col_edit1:
-                            edit_tgl = st.date_input(
-                                "📅 Tanggal Verifikasi",
-                                value=pd.to_datetime(selected_row['tanggal_verifikasi']).date()
-                            )
-                            edit_perusahaan = st.text_input(
-                                "🏢 Nama Perusahaan",
-                                value=selected_row['perusahaan']
-                            )
-                            edit_no_dokumen = st.text_input(
-                                "📄 No. Dokumen",
-                                value=selected_row['no_dokumen']
-                            )
+                            with col_edit1:
+                                edit_tgl = st.date_input(
+                                    "📅 Tanggal Verifikasi",
+                                    value=pd.to_datetime(selected_row['tanggal_verifikasi']).date()
+                                )
+                                edit_perusahaan = st.text_input(
+                                    "🏢 Nama Perusahaan",
+                                    value=selected_row['perusahaan']
+                                )
+                                edit_no_dokumen = st.text_input(
+                                    "📄 No. Dokumen",
+                                    value=selected_row['no_dokumen']
+                                )
+                        
+                            with col_edit2:
+                                edit_nilai = st.number_input(
+                                    "💰 Nilai Tagihan",
+                                    value=float(selected_row['nilai']),
+                                    min_value=0.0,
+                                    step=1000.0
+                                )
+                                edit_status = st.selectbox(
+                                    "📌 Status",
+                                    ["BELUM", "SELESAI"],
+                                    index=0 if selected_row['status'] == "BELUM" else 1
+                                )
                         
-                        with col_edit2:
-                            edit_nilai = st.number_input(
-                                "💰 Nilai Tagihan",
-                                value=float(selected_row['nilai']),
-                                min_value=0.0,
-                                step=1000.0
+                            edit_keterangan = st.text_area(
+                                "📝 Keterangan Tagihan",
+                                value=selected_row['keterangan']
                             )
-                            edit_status = st.selectbox(
-                                "📌 Status",
-                                ["BELUM", "SELESAI"],
-                                index=0 if selected_row['status'] == "BELUM" else 1
+                            edit_masalah = st.text_area(
+                                "❌ Masalah / Kesalahan Dokumen",
+                                value=selected_row['masalah']
                             )
                         
-                        edit_keterangan = st.text_area(
-                            "📝 Keterangan Tagihan",
-                            value=selected_row['keterangan']
-                        )
-                        edit_masalah = st.text_area(
-                            "❌ Masalah / Kesalahan Dokumen",
-                            value=selected_row['masalah']
-                        )
-                        
-                        submit_edit = st.form_submit_button("💾 Simpan Perubahan")
+                            submit_edit = st.form_submit_button("💾 Simpan Perubahan")
                         
                         
-                        if submit_edit:
-                            # Update data di DataFrame - CONVERT date object to datetime
-                            df_verif.loc[original_idx, 'tanggal_verifikasi'] = pd.to_datetime(edit_tgl)  # ← FIX: Convert date to datetime
-                            df_verif.loc[original_idx, 'perusahaan'] = edit_perusahaan
-                            df_verif.loc[original_idx, 'keterangan'] = edit_keterangan
-                            df_verif.loc[original_idx, 'no_dokumen'] = edit_no_dokumen
-                            df_verif.loc[original_idx, 'nilai'] = edit_nilai
-                            df_verif.loc[original_idx, 'masalah'] = edit_masalah
-                            df_verif.loc[original_idx, 'status'] = edit_status
-                            
-                            # Simpan ke Google Drive
-                            if simpan_dokumen_bermasalah(df_verif):
-                                st.success("✅ Data berhasil diupdate!")
-                                st.balloons()
-                                st.cache_data.clear()
-                                st.rerun()
-                            else:
-                                st.error("❌ Gagal menyimpan perubahan")
+                            if submit_edit:
+                                # Update hanya sel baris dokumen ini di Google Sheet
+                                if ubah_dokumen_bermasalah(selected_doc, {
+                                    'tanggal_verifikasi': edit_tgl.strftime("%Y-%m-%d"),
+                                    'perusahaan': edit_perusahaan,
+                                    'keterangan': edit_keterangan,
+                                    'no_dokumen': edit_no_dokumen,
+                                    'nilai': edit_nilai,
+                                    'masalah': edit_masalah,
+                                    'status': edit_status,
+                                }):
+                                    st.success("✅ Data berhasil diupdate!")
+                                    st.balloons()
+                                    st.rerun()
+                                else:
+                                    st.error("❌ Gagal menyimpan perubahan")
                 
-                # AKSI: UBAH STATUS
-                elif action_type == "Ubah Status":
-                    st.info(f"📄 **Dokumen:** {selected_row['no_dokumen']} | **Perusahaan:** {selected_row['perusahaan']}")
-                    st.warning(f"⚠️ **Status Saat Ini:** {selected_row['status']}")
+                    # AKSI: UBAH STATUS
+                    elif action_type == "Ubah Status":
+                        st.info(f"📄 **Dokumen:** {selected_row['no_dokumen']} | **Perusahaan:** {selected_row['perusahaan']}")
+                        st.warning(f"⚠️ **Status Saat Ini:** {selected_row['status']}")
                     
-                    col_status, col_btn = st.columns([2, 1])
+                        col_status, col_btn = st.columns([2, 1])
                     
-                    with col_status:
-                        new_status = st.selectbox(
-                            "Ubah Status Menjadi:",
-                            ["BELUM", "SELESAI"],
-                            index=0 if selected_row['status'] == "BELUM" else 1,
-                            key="new_status_select_tab3"
-                        )
+                        with col_status:
+                            new_status = st.selectbox(
+                                "Ubah Status Menjadi:",
+                                ["BELUM", "SELESAI"],
+                                index=0 if selected_row['status'] == "BELUM" else 1,
+                                key="new_status_select_tab3"
+                            )
                     
-                    with col_btn:
-                        st.write("")  # Spacing
-                        if st.button("💾 Simpan Perubahan", type="primary", key="btn_update_status_tab3"):
-                            # Update status di DataFrame
-                            df_verif.loc[original_idx, 'status'] = new_status
-                            
-                            # Simpan ke Google Drive
-                            if simpan_dokumen_bermasalah(df_verif):
-                                st.success(f"✅ Status berhasil diubah menjadi: **{new_status}**")
-                                st.balloons()
-                                st.cache_data.clear()
-                                st.rerun()
-                            else:
-                                st.error("❌ Gagal menyimpan perubahan")
+                        with col_btn:
+                            st.write("")  # Spacing
+                            if st.button("💾 Simpan Perubahan", type="primary", key="btn_update_status_tab3"):
+                                # Update sel status dokumen ini di Google Sheet
+                                if ubah_dokumen_bermasalah(selected_doc, {'status': new_status}):
+                                    st.success(f"✅ Status berhasil diubah menjadi: **{new_status}**")
+                                    st.balloons()
+                                    st.rerun()
+                                else:
+                                    st.error("❌ Gagal menyimpan perubahan")
                 
-                # AKSI: HAPUS DATA
-                elif action_type == "Hapus Data":
-                    st.error(f"⚠️ **PERHATIAN:** Anda akan menghapus data berikut:")
+                    # AKSI: HAPUS DATA
+                    elif action_type == "Hapus Data":
+                        st.error(f"⚠️ **PERHATIAN:** Anda akan menghapus data berikut:")
                     
-                    col_info1, col_info2 = st.columns(2)
-                    with col_info1:
-                        st.write(f"**No. Dokumen:** {selected_row['no_dokumen']}")
-                        st.write(f"**Perusahaan:** {selected_row['perusahaan']}")
-                        st.write(f"**Tanggal:** {selected_row['tanggal_verifikasi']}")
-                    with col_info2:
-                        st.write(f"**Nilai:** Rp {format_rp(float(selected_row['nilai']))}")
-                        st.write(f"**Status:** {selected_row['status']}")
-                        st.write(f"**Masalah:** {str(selected_row['masalah'])[:50]}...")
+                        col_info1, col_info2 = st.columns(2)
+                        with col_info1:
+                            st.write(f"**No. Dokumen:** {selected_row['no_dokumen']}")
+                            st.write(f"**Perusahaan:** {selected_row['perusahaan']}")
+                            st.write(f"**Tanggal:** {selected_row['tanggal_verifikasi']}")
+                        with col_info2:
+                            st.write(f"**Nilai:** Rp {format_rp(float(selected_row['nilai']))}")
+                            st.write(f"**Status:** {selected_row['status']}")
+                            st.write(f"**Masalah:** {str(selected_row['masalah'])[:50]}...")
                     
-                    st.markdown("---")
+                        st.markdown("---")
                     
-                    col_confirm, col_delete = st.columns([3, 1])
+                        col_confirm, col_delete = st.columns([3, 1])
                     
-                    with col_confirm:
-                        confirm_text = st.text_input(
-                            "Ketik 'HAPUS' untuk konfirmasi:",
-                            key="confirm_delete_tab3"
-                        )
+                        with col_confirm:
+                            confirm_text = st.text_input(
+                                "Ketik 'HAPUS' untuk konfirmasi:",
+                                key="confirm_delete_tab3"
+                            )
                     
-                    with col_delete:
-                        st.write("")  # Spacing
-                        if st.button("🗑️ Hapus Data", type="primary", key="btn_delete_tab3", disabled=(confirm_text != "HAPUS")):
-                            # Hapus data dari DataFrame
-                            df_verif = df_verif.drop(original_idx).reset_index(drop=True)
-                            
-                            # Simpan ke Google Drive
-                            if simpan_dokumen_bermasalah(df_verif):
-                                st.success("✅ Data berhasil dihapus!")
-                                st.cache_data.clear()
-                                st.rerun()
-                            else:
-                                st.error("❌ Gagal menghapus data")
-        else:
-            st.info("ℹ️ Tidak ada data untuk diedit atau dihapus")
+                        with col_delete:
+                            st.write("")  # Spacing
+                            if st.button("🗑️ Hapus Data", type="primary", key="btn_delete_tab3", disabled=(confirm_text != "HAPUS")):
+                                # Hapus satu baris dokumen ini dari Google Sheet
+                                if hapus_dokumen_bermasalah(selected_doc):
+                                    st.success("✅ Data berhasil dihapus!")
+                                    st.rerun()
+                                else:
+                                    st.error("❌ Gagal menghapus data")
+            else:
+                st.info("ℹ️ Tidak ada data untuk diedit atau dihapus")
+
+        panel_edit_dokumen(data)
 
         # =============================
         # TAMPILAN TABEL DATA
@@ -1981,14 +3519,14 @@ if st.session_state.active_tab == "tab3":
                 display_columns.append(col)
 
         # Tampilkan dataframe dengan styling untuk status
-        def highlight_status(row):
-            if row['status'] == 'SELESAI':
-                return ['background-color: #d4edda'] * len(row)
-            else:
-                return ['background-color: #fff3cd'] * len(row)
+        css_status = np.where(
+            data_tampil["status"].to_numpy() == "SELESAI",
+            "background-color: #d4edda",
+            "background-color: #fff3cd",
+        )
 
         st.dataframe(
-            data_tampil[display_columns].style.apply(highlight_status, axis=1),
+            gaya_tabel(data_tampil[display_columns], css_baris=css_status),
             use_container_width=True,
             height=400
         )
@@ -0,0 +1,64 @@
+"""
+Benchmark styling Tabel Realisasi Anggaran: callback Styler per baris/sel lama
+(warna_persen + highlight_hapus) lawan array CSS gaya_tabel. Waktu termasuk _compute(),
+yang dijalankan st.dataframe saat tabel dirender.
+Jalankan: python benchmarks/bench_gaya_tabel.py [--baris N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from muat_app import muat_app  # noqa: E402
+from test_gaya_tabel import buat_highlight_hapus, ctx, lap_uji, tampil_tabel1, warna_persen_lama  # noqa: E402
+
+app = muat_app(
+    "format_rp", "CSS_MERAH", "CSS_KUNING", "CSS_HIJAU", "CSS_DIHAPUS", "warna_persen", "gaya_tabel"
+)
+
+
+def gaya_lama(lap_f, tampil):
+    return tampil.style.map(warna_persen_lama, subset=["persen"]).apply(buat_highlight_hapus(lap_f), axis=1)
+
+
+def gaya_baru(lap_f, tampil):
+    dihapus = lap_f["status_hapus"].astype(str).str.strip().str.upper().eq("H").to_numpy()
+    return app.gaya_tabel(
+        tampil,
+        css_kolom={"persen": app.warna_persen(lap_f["persen"])},
+        css_baris=np.where(dihapus, app.CSS_DIHAPUS, ""),
+    )
+
+
+def ukur(fungsi, lap_f, tampil, ulang):
+    terbaik = float("inf")
+    for _ in range(ulang):
+        mulai = time.perf_counter()
+        fungsi(lap_f, tampil)._compute()
+        terbaik = min(terbaik, time.perf_counter() - mulai)
+    return terbaik
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baris", type=int, default=5_000)
+    parser.add_argument("--ulang", type=int, default=3)
+    args = parser.parse_args()
+
+    lap_f = lap_uji(args.baris)
+    tampil = tampil_tabel1(lap_f)
+    assert ctx(gaya_baru(lap_f, tampil)) == ctx(gaya_lama(lap_f, tampil))
+
+    t_lama = ukur(gaya_lama, lap_f, tampil, args.ulang)
+    t_baru = ukur(gaya_baru, lap_f, tampil, args.ulang)
+    print(f"baris            : {args.baris:,} (waktu terbaik dari {args.ulang}x)")
+    print(f"callback Styler  : {t_lama * 1000:9.1f} ms")
+    print(f"array CSS        : {t_baru * 1000:9.1f} ms")
+    print(f"percepatan       : {t_lama / t_baru:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
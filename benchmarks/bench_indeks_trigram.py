@@ -0,0 +1,84 @@
+"""
+Benchmark pencarian teks Laporan SIMRS: astype(str).str.contains per baris lawan
+indeks trigram (bangun sekali per versi data, lalu dipakai setiap query).
+Jalankan: python benchmarks/bench_indeks_trigram.py [--baris N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from muat_app import muat_app  # noqa: E402
+
+app = muat_app("_trigram", "bangun_indeks_trigram", "cari_indeks_trigram")
+
+KATA_KETERANGAN = [
+    "pengadaan", "pemeliharaan", "alat", "kesehatan", "obat", "bahan", "habis", "pakai",
+    "jasa", "konsultansi", "gedung", "instalasi", "farmasi", "laboratorium", "radiologi",
+    "rawat", "inap", "jalan", "bulan", "tahap", "termin", "uang", "muka", "belanja",
+]
+QUERY = {
+    "no_spk": ["0001", "12345", "RSUD/2024", "spk", "9", "12"],
+    "no_transaksi": ["TRX-2024", "00777", "-05-", "x"],
+    "keterangan_vpu": ["alat kesehatan", "termin 3", "farmasi", "laboratorium bulan", "zzz", "ab"],
+}
+
+
+def data_uji(baris, seed=0):
+    """Kolom pencarian SIMRS sintetis: nomor dokumen unik-ish dan keterangan bebas"""
+    rng = np.random.default_rng(seed)
+    nomor = rng.integers(0, baris // 2, baris)
+    kata = np.array(KATA_KETERANGAN)
+    keterangan = [
+        " ".join(kata[rng.integers(0, len(kata), rng.integers(3, 9))]).capitalize() + f" termin {t}"
+        for t in rng.integers(1, 5, baris)
+    ]
+    kosong = rng.random(baris) < 0.05
+    keterangan = pd.Series(keterangan, dtype=object).mask(kosong)
+    return pd.DataFrame({
+        "no_spk": [f"SPK/{n:06d}/RSUD/2024" for n in nomor],
+        "no_transaksi": [f"TRX-2024-{n % 12 + 1:02d}-{n:07d}" for n in nomor],
+        "keterangan_vpu": keterangan,
+    })
+
+
+def ukur(fungsi, ulang):
+    terbaik = float("inf")
+    for _ in range(ulang):
+        mulai = time.perf_counter()
+        hasil = fungsi()
+        terbaik = min(terbaik, time.perf_counter() - mulai)
+    return terbaik, hasil
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baris", type=int, default=200_000)
+    parser.add_argument("--ulang", type=int, default=5)
+    args = parser.parse_args()
+
+    simrs = data_uji(args.baris)
+    print(f"baris: {args.baris:,} (query: waktu terbaik dari {args.ulang}x)")
+    total_bangun = 0.0
+    for kolom, daftar_kata in QUERY.items():
+        t_bangun, indeks = ukur(lambda: app.bangun_indeks_trigram(simrs[kolom]), 1)
+        total_bangun += t_bangun
+        print(f"\n{kolom}: bangun indeks {t_bangun * 1000:.0f} ms ({len(indeks['unik']):,} teks unik)")
+        print(f"  {'kata':22s} {'str.contains':>13s} {'trigram':>10s} {'cocok':>8s}")
+        for kata in daftar_kata:
+            t_lama, acuan = ukur(
+                lambda: simrs[kolom].astype(str).str.contains(kata, case=False, regex=False).to_numpy(dtype=bool),
+                args.ulang,
+            )
+            t_baru, mask = ukur(lambda: app.cari_indeks_trigram(indeks, kata), args.ulang)
+            assert (mask == acuan).all(), (kolom, kata)
+            print(f"  {kata!r:22s} {t_lama * 1000:10.1f} ms {t_baru * 1000:7.1f} ms {int(mask.sum()):8,d}")
+    print(f"\ntotal bangun indeks (sekali per versi data): {total_bangun:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
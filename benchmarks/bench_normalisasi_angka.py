@@ -0,0 +1,71 @@
+"""
+Benchmark normalisasi_angka: series.apply(_angka_tunggal) (implementasi lama, per sel)
+lawan versi vektor Arrow. Jalankan: python benchmarks/bench_normalisasi_angka.py [--baris N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+from muat_app import muat_app  # noqa: E402
+
+app = muat_app("POLA_ANGKA_POLOS", "POLA_FLOAT", "JENIS_NILAI", "_angka_tunggal", "normalisasi_angka")
+
+
+def data_uji(baris, campuran, seed=0):
+    """
+    Kolom nilai seperti hasil read_excel MA/SIMRS.
+    campuran=False: semua sel teks; True: 20% sel sudah int/float dari Excel.
+    """
+    rng = np.random.default_rng(seed)
+    angka = rng.integers(0, 2_000_000_000, baris)
+    jenis = rng.integers(0, 10 if campuran else 8, baris)
+    nilai = np.empty(baris, dtype=object)
+    for i, (a, j) in enumerate(zip(angka, jenis)):
+        if j < 4:
+            nilai[i] = f"{a:,}".replace(",", ".")            # "239.999.893"
+        elif j < 6:
+            nilai[i] = f"{a:,}".replace(",", ".") + ",56"    # "1.234,56"
+        elif j == 6:
+            nilai[i] = f"{a:,}"                              # "1,234,567"
+        elif j == 7:
+            nilai[i] = "-"
+        elif j == 8:
+            nilai[i] = float(a)
+        else:
+            nilai[i] = int(a)
+    return pd.Series(nilai, name="nilai")
+
+
+def ukur(fungsi, series, ulang):
+    terbaik = float("inf")
+    for _ in range(ulang):
+        mulai = time.perf_counter()
+        fungsi(series)
+        terbaik = min(terbaik, time.perf_counter() - mulai)
+    return terbaik
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baris", type=int, default=200_000)
+    parser.add_argument("--ulang", type=int, default=5)
+    args = parser.parse_args()
+
+    lama = lambda s: s.apply(app._angka_tunggal)  # noqa: E731
+    print(f"baris: {args.baris:,} (waktu terbaik dari {args.ulang}x)")
+    print(f"{'kolom':10s} {'apply per sel':>14s} {'vektor':>10s} {'percepatan':>11s}")
+    for label, campuran in (("teks", False), ("campuran", True)):
+        series = data_uji(args.baris, campuran)
+        pd.testing.assert_series_equal(app.normalisasi_angka(series), lama(series).astype(np.float64))
+        t_lama = ukur(lama, series, args.ulang)
+        t_baru = ukur(app.normalisasi_angka, series, args.ulang)
+        print(f"{label:10s} {t_lama * 1000:11.1f} ms {t_baru * 1000:7.1f} ms {t_lama / t_baru:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Process pool parser XLSX untuk ingest Drive (dipakai pool_parser di app.py).
+Dipisah dari app.py karena proses anak spawn/forkserver mengimpor modul __main__
+induknya; di Streamlit itu adalah app.py sendiri.
+"""
+import os
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import spawn
+
+import pandas as pd
+
+# Fork tidak dipakai: fork dari server yang multithread bisa mewarisi lock yang
+# sedang dipegang thread lain dan membuat proses anak deadlock.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _KONTEKS = multiprocessing.get_context("forkserver")
+else:
+    _KONTEKS = multiprocessing.get_context("spawn")
+
+_FOLDER = os.path.dirname(os.path.abspath(__file__))
+_AWALAN_NAMA = "IngestWorker-"
+
+
+def parse_xlsx(konten):
+    """Parse isi file XLSX (bytes) menjadi DataFrame"""
+    return pd.read_excel(BytesIO(konten))
+
+
+def _data_persiapan(get_preparation_data):
+    """
+    Bungkus spawn.get_preparation_data untuk proses worker ingest saja.
+    Data persiapan menyalin __main__ dan sys.path induk. Di Streamlit, __main__ adalah
+    script app.py (anak akan menjalankannya ulang sebagai __mp_main__), dan folder app
+    hanya ada di sys.path selama script sedang berjalan. Worker tidak butuh __main__
+    induk (target dan parse_xlsx diimpor dari modul biasa), jadi entri __main__ dibuang
+    dan folder modul ini dipastikan ada di sys.path anak. Proses lain tidak tersentuh.
+    """
+    def bungkus(name):
+        data = get_preparation_data(name)
+        if name.startswith(_AWALAN_NAMA):
+            data.pop("init_main_from_name", None)
+            data.pop("init_main_from_path", None)
+            data["sys_path"] = [_FOLDER] + [p for p in data.get("sys_path", []) if p != _FOLDER]
+        return data
+
+    bungkus.asli = get_preparation_data
+    return bungkus
+
+
+# Dipasang sekali saat modul diimpor (di bawah import lock), bukan ditukar per start():
+# tidak ada state global proses (sys.modules["__main__"], sys.path) yang diubah
+# sementara, sehingga tidak berbenturan dengan ScriptRunner Streamlit yang mengganti
+# __main__ di setiap rerun.
+if not hasattr(spawn.get_preparation_data, "asli"):
+    spawn.get_preparation_data = _data_persiapan(spawn.get_preparation_data)
+
+
+class _ProsesWorker(_KONTEKS.Process):
+    """Process worker ingest; nama berawalan _AWALAN_NAMA menandai data persiapannya"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = _AWALAN_NAMA + self.name
+
+
+class _KonteksWorker(type(_KONTEKS)):
+    Process = _ProsesWorker
+
+
+def buat_pool(max_workers):
+    """ProcessPoolExecutor forkserver/spawn yang aman dipakai dari server Streamlit"""
+    konteks = _KonteksWorker()
+    if konteks.get_start_method() == "forkserver":
+        konteks.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=konteks)
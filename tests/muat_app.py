@@ -0,0 +1,44 @@
+"""
+Muat definisi top-level tertentu dari app.py tanpa menjalankan script Streamlit.
+app.py adalah script (bukan modul yang bisa diimpor), jadi yang dieksekusi hanya
+import di bagian atas plus fungsi/kelas/konstanta yang diminta, sesuai urutan di file.
+"""
+import ast
+import os
+import sys
+from types import SimpleNamespace
+
+FOLDER_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATH_APP = os.path.join(FOLDER_APP, "app.py")
+
+if FOLDER_APP not in sys.path:
+    sys.path.insert(0, FOLDER_APP)
+
+
+def _nama_node(node):
+    if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+        return {node.name}
+    if isinstance(node, ast.Assign):
+        return {t.id for t in node.targets if isinstance(t, ast.Name)}
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        return {node.target.id}
+    return set()
+
+
+def muat_app(*nama):
+    """Return namespace berisi nama-nama top-level app.py yang diminta"""
+    with open(PATH_APP, encoding="utf-8") as f:
+        pohon = ast.parse(f.read(), PATH_APP)
+
+    diminta = set(nama)
+    body = [
+        node for node in pohon.body
+        if isinstance(node, (ast.Import, ast.ImportFrom)) or _nama_node(node) & diminta
+    ]
+    kurang = diminta - set().union(*map(_nama_node, body))
+    if kurang:
+        raise NameError(f"tidak ada di app.py: {sorted(kurang)}")
+
+    ns = {"__name__": "app"}
+    exec(compile(ast.Module(body=body, type_ignores=[]), PATH_APP, "exec"), ns)
+    return SimpleNamespace(**{n: ns[n] for n in nama})
@@ -0,0 +1,88 @@
+import pytest
+from gspread.utils import DateTimeOption, ValueRenderOption
+
+from muat_app import muat_app
+
+app = muat_app(
+    "KOLOM_VERIFIKASI", "NILAI_KOSONG_SHEET", "buat_id_dokumen", "lengkapi_id_dokumen",
+    "baca_sheet_verifikasi", "_baris_db",
+)
+
+HEADER = list(app.KOLOM_VERIFIKASI)
+
+
+class SheetPalsu:
+    """Worksheet gspread tiruan: get_all_values dengan render option, batch_update dicatat"""
+
+    def __init__(self, nilai):
+        self.nilai = nilai
+        self.panggilan = []
+        self.update = []
+
+    def get_all_values(self, value_render_option=None, date_time_render_option=None):
+        self.panggilan.append((value_render_option, date_time_render_option))
+        return self.nilai
+
+    def batch_update(self, data, value_input_option=None):
+        self.update.extend(data)
+
+
+@pytest.fixture
+def pasang_sheet(monkeypatch):
+    def pasang(nilai):
+        sheet = SheetPalsu(nilai)
+        for fungsi in (app.baca_sheet_verifikasi, app.lengkapi_id_dokumen):
+            monkeypatch.setitem(fungsi.__globals__, "_sheet_verifikasi", lambda: (sheet, HEADER))
+        return sheet
+    return pasang
+
+
+BARIS_BARU = ["15/03/2025", "PT A", "Termin 1", "123", 1500000.5, "Kurang TTD", "Baru",
+              "2025-03-15 10:00", "a1b2c3d4e5f6"]
+# Baris lama yang ditulis dengan str(NaN) / str(None) oleh versi sebelumnya
+BARIS_LAMA = ["2024-12-01", "PT B", "nan", "None", "NaN", "NULL", "N/A", "NaT", "0f1e2d3c4b5a"]
+
+
+def test_token_na_dibaca_sebagai_nan(pasang_sheet):
+    sheet = pasang_sheet([HEADER, BARIS_BARU, [""] * len(HEADER), BARIS_LAMA, ["2025-01-02", "PT C"]])
+    df = app.baca_sheet_verifikasi()
+
+    assert sheet.panggilan == [(ValueRenderOption.unformatted, DateTimeOption.formatted_string)]
+    assert len(df) == 3  # baris kosong dibuang, baris pendek dilengkapi
+    assert df.iloc[0].tolist() == BARIS_BARU
+
+    lama = df.iloc[1]
+    assert lama[["tanggal_verifikasi", "perusahaan", "id_dokumen"]].tolist() == ["2024-12-01", "PT B", "0f1e2d3c4b5a"]
+    assert lama[["keterangan", "no_dokumen", "nilai", "masalah", "status", "tanggal_input"]].isna().all()
+    assert df.iloc[2][HEADER[2:]].isna().all()
+
+    # Tidak ada teks "nan" yang sampai ke SQLite (tabel, dropdown dan form edit membaca dari sana)
+    baris_db = app._baris_db(lama.to_dict())
+    assert baris_db == ["2024-12-01", "PT B", None, None, None, None, None, None, "0f1e2d3c4b5a"]
+
+
+@pytest.mark.parametrize("token", sorted(app.NILAI_KOSONG_SHEET))
+def test_setiap_token_na(pasang_sheet, token):
+    pasang_sheet([HEADER, ["2025-01-02", "PT D", token, token, token, "", "", "", "id"]])
+    df = app.baca_sheet_verifikasi()
+    assert df[["keterangan", "no_dokumen", "nilai"]].isna().all(axis=None)
+
+
+def test_nilai_bukan_token_tetap(pasang_sheet):
+    isi = ["2025-01-02", "PT nan", "nanas", "None-1", 0, "NA ", "-", "0", "id"]
+    pasang_sheet([HEADER, isi])
+    assert app.baca_sheet_verifikasi().iloc[0].tolist() == isi
+
+
+def test_sheet_kosong(pasang_sheet):
+    pasang_sheet([HEADER])
+    df = app.baca_sheet_verifikasi()
+    assert df.empty and list(df.columns) == HEADER
+
+
+def test_lengkapi_id_untuk_id_token_na(pasang_sheet):
+    sheet = pasang_sheet([HEADER, BARIS_BARU, BARIS_LAMA[:-1] + ["nan"], BARIS_LAMA[:-1], [""] * len(HEADER)])
+    assert app.lengkapi_id_dokumen() == 2
+    kolom = chr(ord("A") + HEADER.index("id_dokumen"))
+    assert [u["range"] for u in sheet.update] == [f"{kolom}3", f"{kolom}4"]
+    assert all(len(u["values"][0][0]) == 12 for u in sheet.update)
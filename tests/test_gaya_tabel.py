@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from muat_app import muat_app
+
+app = muat_app(
+    "format_rp", "CSS_MERAH", "CSS_KUNING", "CSS_HIJAU", "CSS_DIHAPUS", "warna_persen", "gaya_tabel"
+)
+
+
+# Callback Styler per sel / per baris sebelum user-008 (disalin dari app.py lama)
+def warna_persen_lama(val):
+    try:
+        val = float(str(val).replace("%", ""))
+    except:  # noqa: E722
+        return ""
+    if val >= 100:
+        return "background-color: #f8d7da; color: #721c24;"
+    elif val >= 70:
+        return "background-color: #fff3cd; color: #856404;"
+    else:
+        return "background-color: #d4edda; color: #155724;"
+
+
+def buat_highlight_hapus(lap_f):
+    def highlight_hapus(row):
+        try:
+            kode = row["kode_ma"]
+            status = lap_f[lap_f["kode_ma"] == kode]["status_hapus"].iloc[0]
+            if str(status).strip().upper() == "H":
+                return ['color: red; font-weight: bold'] * len(row)
+        except:  # noqa: E722
+            pass
+        return [''] * len(row)
+    return highlight_hapus
+
+
+def highlight_status(row):
+    if row['status'] == 'SELESAI':
+        return ['background-color: #d4edda'] * len(row)
+    else:
+        return ['background-color: #fff3cd'] * len(row)
+
+
+def ctx(styler):
+    """CSS hasil render per sel: {(baris, kolom): [(properti, nilai), ...]}, sel kosong dibuang"""
+    styler._compute()
+    return {sel: css for sel, css in styler.ctx.items() if css}
+
+
+PERSEN = np.concatenate([
+    np.arange(69.98, 70.02, 0.001),
+    np.arange(99.98, 100.02, 0.001),
+    [0.0, 12.345, 69.995, 99.995, 99.9949999, 150.0, -5.0, np.inf, -np.inf, np.nan],
+])
+STATUS = ["H", " h ", "h", "", "A", None, np.nan, "HAPUS", 1]
+
+
+def lap_uji(n):
+    rng = np.random.default_rng(0)
+    persen = np.resize(PERSEN, n)
+    status = np.resize(np.array(STATUS, dtype=object), n)
+    pagu = rng.integers(1, 10**9, n).astype(float)
+    return pd.DataFrame({
+        "kode_ma": [f"{525111 + i}.{i % 7}.1" for i in range(n)],
+        "uraian": [f"Belanja {i}" for i in range(n)],
+        "pagu": pagu,
+        "capaian": pagu * np.nan_to_num(persen, posinf=2, neginf=-1) / 100,
+        "persen": persen,
+        "status_hapus": status,
+    }).iloc[rng.permutation(n)].reset_index(drop=True)
+
+
+def tampil_tabel1(lap_f):
+    tampil = lap_f.copy()
+    for kolom in ["pagu", "capaian"]:
+        tampil[kolom] = tampil[kolom].apply(app.format_rp)
+    tampil["persen"] = tampil["persen"].apply(lambda x: f"{x:.2f}%")
+    return tampil[["kode_ma", "uraian", "pagu", "capaian", "persen"]]
+
+
+def test_tabel_realisasi_sama_dengan_callback_lama():
+    lap_f = lap_uji(len(PERSEN) * len(STATUS))
+    tampil = tampil_tabel1(lap_f)
+
+    lama = tampil.style.map(warna_persen_lama, subset=["persen"]).apply(buat_highlight_hapus(lap_f), axis=1)
+    dihapus = lap_f["status_hapus"].astype(str).str.strip().str.upper().eq("H").to_numpy()
+    baru = app.gaya_tabel(
+        tampil,
+        css_kolom={"persen": app.warna_persen(lap_f["persen"])},
+        css_baris=np.where(dihapus, app.CSS_DIHAPUS, ""),
+    )
+    assert ctx(baru) == ctx(lama)
+
+
+@pytest.mark.parametrize("persen", PERSEN, ids=repr)
+def test_ambang_persen_sama_dengan_callback_lama(persen):
+    # Rekap pengendali memformat "12.34 %" (dengan spasi)
+    for teks in (f"{persen:.2f}%", f"{persen:.2f} %"):
+        assert app.warna_persen([persen])[0] == warna_persen_lama(teks)
+
+
+def test_status_verifikasi_sama_dengan_callback_lama():
+    data = pd.DataFrame({
+        "perusahaan": ["PT A", "PT B", "PT C", "PT D"],
+        "nilai": [1.0, 2.0, np.nan, 4.0],
+        "status": ["SELESAI", "BELUM", None, "selesai"],
+    })
+    lama = data.style.apply(highlight_status, axis=1)
+    css_status = np.where(
+        data["status"].to_numpy() == "SELESAI",
+        "background-color: #d4edda",
+        "background-color: #fff3cd",
+    )
+    assert ctx(app.gaya_tabel(data, css_baris=css_status)) == ctx(lama)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from muat_app import muat_app
+
+app = muat_app("_trigram", "bangun_indeks_trigram", "cari_indeks_trigram")
+
+
+def _acak(rng, n, huruf="abcAB-/.0123 "):
+    return ["".join(rng.choice(list(huruf), rng.integers(0, 12))) for _ in range(n)]
+
+
+def data_simrs():
+    rng = np.random.default_rng(0)
+    khusus = [
+        np.nan, None, "", "nan", "SPK/001/RSUD/2024", "spk-001-rsud-2024", "(copy) SPK.01",
+        "a.b[c]*", "50% uang muka", "Pengadaan ALAT Kesehatan", "pengadaan alat kesehatan",
+        "Straße Ärzte – Gebühr", "STRASSE", "İstanbul", "ﬁle ﬂow", "FILE", "Σίσυφος", "日本語 VPU",
+        "x\x00y", "  spasi  ",
+    ]
+    n = 400
+    return pd.DataFrame({
+        "no_spk": np.resize(np.array(khusus + [f"SPK/{i:04d}/2024" for i in range(60)], dtype=object), n),
+        "no_transaksi": np.resize(np.array(khusus + _acak(rng, 200), dtype=object), n),
+        "keterangan_vpu": np.resize(np.array(_acak(rng, 150, "aeiou kstAEIOU.é") + khusus, dtype=object), n),
+    })
+
+
+KATA = [
+    "", "a", "A", "ab", "é", "ß", "-", "0", "SPK", "spk/", "/2024", "2024", "0001", "nan", "NaN",
+    "kesehatan", "ALAT KES", "xyzzy", "(", "(copy)", "a.b", ".", "[c]", "*", "50%", "strasse", "SS",
+    "ss", "straße", "i̇", "istanbul", "İst", "fi", "ﬁle", "FILE", "σ", "Σ", "σίσυφος", "vpu", "日本",
+    "\x00", "x\x00y", "  spasi", "spasi  ", "ba", "abc", "aab", "b-a", "oe", "ka", "sta",
+]
+
+
+@pytest.fixture(scope="module")
+def simrs():
+    return data_simrs()
+
+
+@pytest.fixture(scope="module")
+def indeks(simrs):
+    return {kolom: app.bangun_indeks_trigram(simrs[kolom]) for kolom in simrs.columns}
+
+
+@pytest.mark.parametrize("kolom", ["no_spk", "no_transaksi", "keterangan_vpu"])
+@pytest.mark.parametrize("kata", KATA, ids=repr)
+def test_sama_dengan_str_contains(simrs, indeks, kolom, kata):
+    acuan = simrs[kolom].astype(str).str.contains(kata, case=False, regex=False).to_numpy()
+    np.testing.assert_array_equal(app.cari_indeks_trigram(indeks[kolom], kata), acuan)
+
+
+@pytest.mark.parametrize("kolom", ["no_spk", "no_transaksi", "keterangan_vpu"])
+def test_potongan_acak_sama_dengan_str_contains(simrs, indeks, kolom):
+    rng = np.random.default_rng(1)
+    teks = simrs[kolom].astype(str)
+    # pandas >= 3: astype(str) mempertahankan NaN, jadi sampel diambil dari teks saja
+    sampel = teks.dropna()
+    for _ in range(200):
+        sumber = sampel.iloc[rng.integers(len(sampel))]
+        awal = rng.integers(0, max(len(sumber), 1))
+        kata = sumber[awal:awal + rng.integers(1, 7)]
+        kata = kata.upper() if rng.random() < 0.5 else kata
+        acuan = teks.str.contains(kata, case=False, regex=False).to_numpy()
+        np.testing.assert_array_equal(app.cari_indeks_trigram(indeks[kolom], kata), acuan, err_msg=repr(kata))
+
+
+def test_kolom_kosong():
+    indeks = app.bangun_indeks_trigram(pd.Series([], dtype=object))
+    assert app.cari_indeks_trigram(indeks, "spk").shape == (0,)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from muat_app import muat_app
+
+app = muat_app("POLA_ANGKA_POLOS", "POLA_FLOAT", "JENIS_NILAI", "_angka_tunggal", "normalisasi_angka")
+
+KORPUS = [
+    "239.999.893", "1.234,56", "1.234.567,89", "1,234,567", "1,234", "239999893,0",
+    "239999893.0", "0", "12", ".5", "5.", "1e3", "1E-2", "+7",
+    "-", "", " ", "nan", "NaN", "None", "inf", "-inf",
+    "-1.234,56", "-239.999.893", "-1,234,567", "-12,5", "- 5", "--5", "-.",
+    "  239.999.893  ", " 1.234,56", "1 234 567", "\t12\n",
+    "Rp 1.000", "Rp1.500.000,50", "1_000", "abc", "12abc", "1.2.3,4,5", ",", ".", "e",
+    "１２３", "12,5 €",
+    np.nan, None, pd.NaT,
+    0, 7, -3, 239999893, 1.5, -2.25, 0.0, float("nan"), True, np.float64(3.5), np.int64(4),
+]
+
+
+def _acuan(series):
+    return series.map(app._angka_tunggal).astype(np.float64)
+
+
+@pytest.mark.parametrize("nilai", KORPUS, ids=repr)
+def test_nilai_tunggal_sama_dengan_aturan_per_sel(nilai):
+    series = pd.Series([nilai], dtype=object)
+    pd.testing.assert_series_equal(app.normalisasi_angka(series), _acuan(series))
+
+
+@pytest.mark.parametrize("dtype", [object, "string"])
+def test_kolom_campuran_sama_dengan_aturan_per_sel(dtype):
+    teks = [v for v in KORPUS if isinstance(v, str)]
+    series = pd.Series(teks * 3, dtype=dtype, name="nilai", index=range(10, 10 + 3 * len(teks)))
+    acuan = _acuan(series.astype(object))
+    pd.testing.assert_series_equal(app.normalisasi_angka(series), acuan)
+
+
+def test_kolom_object_dengan_tipe_campuran():
+    series = pd.Series(KORPUS * 2, dtype=object, name="nilai")
+    pd.testing.assert_series_equal(app.normalisasi_angka(series), _acuan(series))
+
+
+@pytest.mark.parametrize("nilai", [[1, 2, 3], [1.5, np.nan, -2.0], [True, False]])
+def test_kolom_numerik_langsung_float(nilai):
+    series = pd.Series(nilai)
+    pd.testing.assert_series_equal(app.normalisasi_angka(series), _acuan(series))